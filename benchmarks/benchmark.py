@@ -0,0 +1,121 @@
+"""
+Times the fast paths against the naive implementations they replaced.
+
+    python benchmarks/benchmark.py [name ...]
+
+Timings are noisy on shared machines, so they live here rather than in the test
+suite; tests/test_benchmark.py only checks that both paths give the same results.
+Exits non-zero if a fast path comes out slower.
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from conjure import query
+from test_benchmark import BenchmarkTest
+
+
+def best_of(fast, slow, number=200, repeat=7):
+    fast_times = []
+    slow_times = []
+
+    # Interleaved so that a burst of load hits both sides alike.
+    for _ in xrange(repeat):
+        fast_times.append(timeit.timeit(fast, number=number))
+        slow_times.append(timeit.timeit(slow, number=number))
+
+    return min(fast_times), min(slow_times)
+
+
+def to_python(fixture):
+    Wide = fixture.Wide
+
+    for label, data in (('wide', fixture.wide), ('sparse', fixture.sparse)):
+        yield 'to_python (%s)' % label, lambda: Wide.to_python(data), lambda: fixture.naive_to_python(Wide, data), 200
+
+
+def save(fixture):
+    for label, data in (('wide', fixture.wide), ('sparse', fixture.sparse)):
+        doc = fixture.Wide.to_python(data)
+        yield 'save (%s)' % label, lambda: fixture.compiled_save(doc), lambda: fixture.naive_save(doc), 200
+
+
+def values(fixture):
+    convert = query.Query(fixture.Wide, None).values_list('id', 'name_0', 'count_0')._values
+    yield 'values_list', lambda: convert(fixture.wide), lambda: fixture.Wide.to_python(fixture.wide), 200
+
+
+def compile_spec(fixture):
+    Wide = fixture.Wide
+    spec = Wide.name_0 == u'name'
+
+    for i in xrange(10):
+        spec &= getattr(Wide, 'count_%d' % i) > i
+        spec &= getattr(Wide, 'generic_%d' % i).in_([i, i + 1])
+
+    spec |= Wide.name_1 != u'name'
+
+    yield 'compile (cached)', lambda: spec.compile(), lambda: spec._compile(''), 200
+
+
+def chained_filter(fixture):
+    specs = [getattr(fixture.Wide, 'generic_%d' % i).in_([i, i + 1]) for i in xrange(40)]
+
+    def persistent():
+        spec = specs[0]
+
+        for other in specs[1:]:
+            spec &= other
+
+        return spec.compile()
+
+    yield 'filter chaining', persistent, lambda: fixture.naive_filter(specs), 50
+
+
+def prepare(fixture):
+    Wide = fixture.Wide
+    q = query.Query(Wide, None)
+
+    def build(p):
+        return (Wide.name_0 == p.name) & Wide.count_0.in_(p.counts) & (Wide.date_0 > p.since)
+
+    values = {'name': u'name', 'counts': [1, 2, 3], 'since': datetime.datetime(2012, 1, 1)}
+    literals = type('Values', (object,), values)
+    prepared = q.prepare(build)
+
+    bound = lambda: prepared.bind(**values)._compile_spec()
+    adhoc = lambda: q.clone().filter(build(literals))._compile_spec()
+
+    yield 'prepared query', bound, adhoc, 200
+
+
+BENCHMARKS = [to_python, save, values, compile_spec, chained_filter, prepare]
+
+
+def main(names):
+    fixture = BenchmarkTest('test_to_python')
+    fixture.setUp()
+
+    slower = 0
+
+    for benchmark in BENCHMARKS:
+        if names and benchmark.__name__ not in names:
+            continue
+
+        for label, fast, slow, number in benchmark(fixture):
+            fast_time, slow_time = best_of(fast, slow, number)
+            slower += fast_time >= slow_time
+
+            print '%-22s %.4fs vs %.4fs  %5.1fx' % (label, fast_time, slow_time, slow_time / fast_time)
+
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
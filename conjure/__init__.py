@@ -1,7 +1,11 @@
+from .bulk import *
+from .connection import *
 from .documents import *
 from .exceptions import *
 from .eagerload import *
 from .fields import *
+from .futures import *
+from .identity_map import *
 from bson.objectid import ObjectId, InvalidId
 
 DOUBLE = 1
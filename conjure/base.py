@@ -22,6 +22,8 @@ class DocumentMeta(type):
 
         _meta = {
             'db': 'mongodb://localhost:27017/_conjure',
+            'alias': None,
+            'read_preference': None,
             'verbose_name': name.lower(),
             'verbose_name_plural': name.lower() + 's',
             'collection': name.lower() + 's',
@@ -75,6 +77,7 @@ class DocumentMeta(type):
 
         attrs['_name'] = '.'.join(reversed(_name))
         attrs['_superclasses'] = _superclasses
+        attrs['_subclasses'] = {}
         attrs['_meta'] = _meta
         attrs['_fields'] = _fields
 
@@ -84,6 +87,11 @@ class DocumentMeta(type):
             field.owner = new_cls
             field.add_to_document(new_cls)
 
+        for superclass in _superclasses.itervalues():
+            superclass._subclasses[new_cls._name] = new_cls
+
+        new_cls._compile()
+
         if not _meta['embedded']:
             global _documents
             _documents.append(new_cls)
@@ -99,6 +107,9 @@ class BaseDocument(object):
     def __init__(self, **data):
         self._data = {}
         self._search_index = None
+        self._changed_fields = None
+        self._parent = None
+        self._siblings = None
 
         for attr_name, attr_value in data.iteritems():
             try:
@@ -163,6 +174,20 @@ class BaseDocument(object):
 
             return '%s object' % self.__class__.__name__
 
+    @classmethod
+    def _compile(cls):
+        fields = cls._fields.values()
+
+        cls._hydration_plan = dict((field.db_field, (field.name, None if field.python_is_identity() else field.to_python))
+                                   for field in fields)
+
+        cls._serialization_plan = [(field.name, field.db_field, None if field.mongo_is_identity() else field.to_mongo)
+                                   for field in fields]
+
+        cls._validation_plan = [(field.name, field,
+                                 field.required and not (isinstance(field, ObjectIdField) and field.name == 'id'))
+                                for field in fields]
+
     @classmethod
     def to_python(cls, data):
         if data is not None:
@@ -170,31 +195,46 @@ class BaseDocument(object):
                 cls_name = data['_cls']
 
                 if cls_name != cls._name:
-                    subclasses = cls._get_subclasses()
+                    cls = cls._subclasses.get(cls_name)
 
-                    if cls_name not in subclasses:
+                    if cls is None:
                         return None
 
-                    cls = subclasses[cls_name]
-
             doc = cls()
-
-            for field in cls._fields.itervalues():
-                if field.db_field in data:
-                    doc._data[field.name] = field.to_python(data[field.db_field])
+            doc._hydrate(data)
+            doc._changed_fields = set()
 
             return doc
 
         return data
 
+    def _hydrate(self, data):
+        _data = self._data
+        plan = self._hydration_plan
+
+        for db_field, value in data.iteritems():
+            step = plan.get(db_field)
+
+            if step is not None:
+                name, converter = step
+                _data[name] = value if converter is None else converter(value)
+
+    def _mark_changed(self, name):
+        if self._parent is not None:
+            document, name = self._parent
+            document._mark_changed(name)
+        elif self._changed_fields is not None:
+            self._changed_fields.add(name)
+
     def to_mongo(self):
         doc = {}
+        _data = self._data
 
-        for field_name, field in self._fields.iteritems():
-            value = self._data.get(field_name, None)
+        for name, db_field, converter in self._serialization_plan:
+            value = _data.get(name)
 
             if value is not None:
-                doc[field.db_field] = field.to_mongo(value)
+                doc[db_field] = value if converter is None else converter(value)
 
         if self._superclasses:
             doc['_cls'] = self._name
@@ -224,16 +264,25 @@ class BaseDocument(object):
         return j
 
     def validate(self):
-        fields = [(field, getattr(self, name)) for name, field in self._fields.iteritems()]
+        _data = self._data
+
+        # Reads _data directly so references are validated as stored and never dereferenced.
+        for name, field, required in self._validation_plan:
+            value = _data.get(name)
+
+            if value is None and field.has_default():
+                value = _data[name] = field.get_default()
+
+                if value is not None:
+                    self._mark_changed(name)
 
-        for field, value in fields:
             if value is not None:
                 try:
                     field._validate(value)
                 except (ValueError, AttributeError, AssertionError):
                     raise ValidationError('Invalid value for field of type "' +
                                                      field.__class__.__name__ + '"')
-            elif not (isinstance(field, ObjectIdField) and field.name == 'id') and field.required:
+            elif required:
                 raise ValidationError('Field "%s" is required' % field.name)
 
     def __eq__(self, other):
@@ -246,6 +295,105 @@ class BaseDocument(object):
         return False
 
 
+def _changes(method):
+    def proxy(self, *args, **kwargs):
+        self._instance._mark_changed(self._name)
+        return method(self, *args, **kwargs)
+
+    proxy.__name__ = method.__name__
+
+    return proxy
+
+
+def _adopt(container, values):
+    # Embedded documents report their changes to the document that owns the container.
+    for value in values:
+        if isinstance(value, BaseDocument):
+            value._parent = (container._instance, container._name)
+
+    return values
+
+
+class BaseList(list):
+    def __init__(self, values, instance, name):
+        list.__init__(self, values)
+        self._instance = instance
+        self._name = name
+
+        _adopt(self, self)
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+    @_changes
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = _adopt(self, list(value))
+        else:
+            _adopt(self, [value])
+
+        list.__setitem__(self, index, value)
+
+    @_changes
+    def __setslice__(self, i, j, values):
+        list.__setslice__(self, i, j, _adopt(self, list(values)))
+
+    @_changes
+    def __iadd__(self, values):
+        return list.__iadd__(self, _adopt(self, list(values)))
+
+    @_changes
+    def append(self, value):
+        list.append(self, _adopt(self, [value])[0])
+
+    @_changes
+    def extend(self, values):
+        list.extend(self, _adopt(self, list(values)))
+
+    @_changes
+    def insert(self, index, value):
+        list.insert(self, index, _adopt(self, [value])[0])
+
+    __delitem__ = _changes(list.__delitem__)
+    __delslice__ = _changes(list.__delslice__)
+    __imul__ = _changes(list.__imul__)
+    pop = _changes(list.pop)
+    remove = _changes(list.remove)
+    reverse = _changes(list.reverse)
+    sort = _changes(list.sort)
+
+
+class BaseDict(dict):
+    def __init__(self, values, instance, name):
+        dict.__init__(self, values)
+        self._instance = instance
+        self._name = name
+
+        _adopt(self, self.itervalues())
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(self),)
+
+    @_changes
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, _adopt(self, [value])[0])
+
+    @_changes
+    def setdefault(self, key, default=None):
+        return dict.setdefault(self, key, _adopt(self, [default])[0])
+
+    @_changes
+    def update(self, *args, **kwargs):
+        values = dict(*args, **kwargs)
+        _adopt(self, values.itervalues())
+        dict.update(self, values)
+
+    __delitem__ = _changes(dict.__delitem__)
+    clear = _changes(dict.clear)
+    pop = _changes(dict.pop)
+    popitem = _changes(dict.popitem)
+
+
 class BaseField(Common):
     def __init__(self, verbose_name=None, db_field=None, required=False, default=None, validators=None, choices=None,
                  editable=True, help_text='', serialize=True):
@@ -287,10 +435,14 @@ class BaseField(Common):
             value = self.get_default()
             instance._data[self.name] = value
 
+            if value is not None:
+                instance._mark_changed(self.name)
+
         return value
 
     def __set__(self, instance, value):
         instance._data[self.name] = value
+        instance._mark_changed(self.name)
 
     def has_default(self):
         return self.default is not None
@@ -312,6 +464,12 @@ class BaseField(Common):
     def to_json(self, value):
         return self.to_python(value)
 
+    def python_is_identity(self):
+        return getattr(self.to_python, 'im_func', None) in _IDENTITY_TO_PYTHON
+
+    def mongo_is_identity(self):
+        return getattr(self.to_mongo, 'im_func', None) is BaseField.to_mongo.im_func and self.python_is_identity()
+
     def validate(self, value):
         pass
 
@@ -367,3 +525,6 @@ class ObjectIdField(BaseField):
             bson.objectid.ObjectId(unicode(value))
         except bson.objectid.InvalidId:
             raise ValidationError('Invalid Object ID')
+
+
+_IDENTITY_TO_PYTHON = (BaseField.to_python.im_func, ObjectIdField.to_python.im_func)
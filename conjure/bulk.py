@@ -0,0 +1,239 @@
+from .exceptions import OperationError, InvalidQueryError
+from .query import Query
+import atexit
+import logging
+import pymongo.errors
+import threading
+import weakref
+
+__all__ = ['BulkWriter', 'IncrementBuffer']
+
+COUNTS = ('nMatched', 'nModified', 'nUpserted', 'nRemoved')
+
+
+class BulkWriter(object):
+    def __init__(self, document_cls, ordered=False, batch_size=1000):
+        self.document_cls = document_cls
+        self.ordered = ordered
+        self.batch_size = batch_size
+        self._operations = []
+        self._offset = 0
+        self._result = self._empty_result()
+
+    @staticmethod
+    def _empty_result():
+        result = dict((key, 0) for key in COUNTS)
+        result['upserted'] = []
+        result['writeErrors'] = []
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        if exc_type is None:
+            self.flush()
+
+    def __len__(self):
+        return len(self._operations)
+
+    def _query(self, query):
+        if isinstance(query, Query):
+            return query
+
+        return self.document_cls.objects.filter(query)
+
+    def _add(self, query, method, document=None, upsert=False):
+        self._operations.append((self._query(query), method, document, upsert))
+
+        if len(self._operations) >= self.batch_size:
+            self._execute()
+
+        return self
+
+    def update(self, query, update_spec):
+        return self._add(query, 'update', update_spec.compile())
+
+    def update_one(self, query, update_spec):
+        return self._add(query, 'update_one', update_spec.compile())
+
+    def upsert(self, query, update_spec, multi=False):
+        return self._add(query, 'update' if multi else 'update_one', update_spec.compile(), True)
+
+    def delete(self, query):
+        return self._add(query, 'remove')
+
+    def delete_one(self, query):
+        return self._add(query, 'remove_one')
+
+    def _execute(self):
+        operations = self._operations
+        self._operations = []
+
+        if not operations or (self.ordered and self._result['writeErrors']):
+            return
+
+        collection = self.document_cls.objects._collection
+
+        if self.ordered:
+            bulk = collection.initialize_ordered_bulk_op()
+        else:
+            bulk = collection.initialize_unordered_bulk_op()
+
+        for query, method, document, upsert in operations:
+            query._invalidate()
+
+            view = bulk.find(query._compile_spec())
+
+            if upsert:
+                view = view.upsert()
+
+            if document is None:
+                getattr(view, method)()
+            else:
+                getattr(view, method)(document)
+
+        offset = self._offset
+
+        try:
+            result = bulk.execute()
+        except pymongo.errors.BulkWriteError, err:
+            result = err.details
+        except pymongo.errors.OperationFailure, err:
+            raise OperationError(unicode(err))
+
+        self._offset += len(operations)
+
+        for key in COUNTS:
+            self._result[key] += result.get(key) or 0
+
+        for upserted in result.get('upserted', []):
+            self._result['upserted'].append({'index': upserted['index'] + offset, '_id': upserted['_id']})
+
+        for error in result.get('writeErrors', []):
+            self._result['writeErrors'].append({
+                'index': error['index'] + offset,
+                'code': error.get('code'),
+                'message': error.get('errmsg'),
+            })
+
+    def flush(self):
+        self._execute()
+
+        result = self._result
+        self._result = self._empty_result()
+        self._offset = 0
+
+        if result['writeErrors']:
+            raise OperationError('%d bulk operation(s) failed' % len(result['writeErrors']), result['writeErrors'])
+
+        return result
+
+
+class IncrementBuffer(object):
+    def __init__(self, interval=1.0, max_size=1000):
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        _buffers.add(self)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, document_cls, object_id, update_spec):
+        for key in update_spec:
+            if not key.startswith('inc:'):
+                raise InvalidQueryError('Only increments can be buffered, got "%s"' % key)
+
+        key = document_cls, document_cls.id.to_mongo(object_id)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            self._pending[key] = update_spec if pending is None else pending & update_spec
+            size = len(self._pending)
+
+            if self._thread is None and self.interval:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+        if size >= self.max_size:
+            self.flush()
+
+    def _merge(self, pending):
+        with self._lock:
+            for key, update_spec in pending:
+                current = self._pending.get(key)
+                self._pending[key] = update_spec if current is None else update_spec & current
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logging.warning('Failed to flush buffered increments', exc_info=True)
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        batches = {}
+
+        for key, update_spec in pending.iteritems():
+            batches.setdefault(key[0], []).append((key, update_spec))
+
+        failures = []
+        errors = []
+
+        for document_cls, batch in batches.iteritems():
+            writer = BulkWriter(document_cls, batch_size=len(batch) + 1)
+
+            try:
+                for (_, object_id), update_spec in batch:
+                    writer.update_one(document_cls.objects.filter_by(id=object_id), update_spec)
+
+                writer.flush()
+            except OperationError, err:
+                if err.errors:
+                    # Write errors fail the same way on every retry, so those increments are dropped.
+                    logging.error('Dropped %d buffered increment(s) for %s: %s' % (
+                        len(err.errors), document_cls._name, [error['message'] for error in err.errors]))
+
+                    errors.extend(dict(error, document=document_cls._name) for error in err.errors)
+                else:
+                    self._merge(batch)
+
+                failures.append('%s: %s' % (document_cls._name, err))
+            except Exception, err:
+                self._merge(batch)
+                failures.append('%s: %s' % (document_cls._name, err))
+
+        if failures:
+            raise OperationError('Failed to flush buffered increments (%s)' % '; '.join(failures), errors)
+
+        return len(pending)
+
+    def close(self):
+        """
+        Stops the background flush and writes out what is pending. Buffers are otherwise closed at exit; one with
+        an interval is kept alive by its flush thread until then.
+        """
+        self._stopped.set()
+        self.flush()
+
+
+_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_buffers():
+    for buffer in list(_buffers):
+        try:
+            buffer.close()
+        except Exception:
+            logging.warning('Failed to flush buffered increments at exit', exc_info=True)
@@ -1,8 +1,14 @@
 from .exceptions import ConnectionError
-from pymongo import MongoClient
+from pymongo import MongoClient, MongoReplicaSetClient
 from pymongo.uri_parser import parse_uri
+import threading
+
+__all__ = ['register_connection', 'connect']
 
 _connections = {}
+_databases = {}
+_aliases = {}
+_lock = threading.RLock()
 
 try:
     import gevent
@@ -10,33 +16,76 @@ except ImportError:
     gevent = None
 
 
-def _get_connection(hosts):
+def register_connection(alias, uri, **options):
+    with _lock:
+        if _aliases.get(alias) == (uri, options):
+            return
+
+        _aliases[alias] = uri, options
+
+        for key in [key for key in _databases if key[0] == alias]:
+            del _databases[key]
+
+        for key in [key for key in _connections if key[0] == alias]:
+            _connections.pop(key).close()
+
+
+def _get_connection(hosts, query, options, alias=None, replica_set=False):
     global _connections
 
     hosts = ['%s:%d' % host for host in hosts]
-    key = ','.join(hosts)
+    key = alias, ','.join(hosts), query, repr(sorted(options.iteritems()))
     connection = _connections.get(key)
 
     if connection is None:
+        kwargs = {'use_greenlets': gevent is not None}
+        kwargs.update(options)
+
+        # MongoClient ignores read preferences on a replica set in pymongo 2.x.
+        client_cls = MongoReplicaSetClient if replica_set else MongoClient
+
         try:
-            connection = _connections[key] = MongoClient(hosts, use_greenlets=gevent is not None)
+            connection = _connections[key] = client_cls('mongodb://%s/?%s' % (','.join(hosts), query), **kwargs)
         except Exception as e:
             raise ConnectionError(e.message)
 
     return connection
 
 
-def connect(uri):
-    parsed_uri = parse_uri(uri)
+def connect(uri=None, alias=None):
+    key = alias, uri
+    db = _databases.get(key)
+
+    if db is not None:
+        return db
+
+    with _lock:
+        db = _databases.get(key)
+
+        if db is not None:
+            return db
+
+        options = {}
+
+        if alias is not None:
+            try:
+                uri, options = _aliases[alias]
+            except KeyError:
+                raise ConnectionError('Connection "%s" has not been registered' % alias)
+
+        parsed_uri = parse_uri(uri)
+
+        hosts = parsed_uri['nodelist']
+        username = parsed_uri['username']
+        password = parsed_uri['password']
+        database = parsed_uri['database']
+        replica_set = 'replicaset' in parsed_uri['options'] or any(name.lower() == 'replicaset' for name in options)
 
-    hosts = parsed_uri['nodelist']
-    username = parsed_uri['username']
-    password = parsed_uri['password']
-    database = parsed_uri['database']
+        db = _get_connection(hosts, uri.partition('?')[2], options, alias, replica_set)[database]
 
-    db = _get_connection(hosts)[database]
+        if username and password:
+            db.authenticate(username, password)
 
-    if username and password:
-        db.authenticate(username, password)
+        _databases[key] = db
 
-    return db
\ No newline at end of file
+    return db
@@ -1,6 +1,8 @@
 from .base import BaseDocument, DocumentMeta, ObjectIdField
 from .exceptions import OperationError
+from .identity_map import current as current_identity_map
 from .query import Query
+from .spec import UpdateSpecification
 import pymongo.errors
 
 __all__ = ['Document', 'EmbeddedDocument']
@@ -15,6 +17,15 @@ class Document(BaseDocument):
     def save(self, safe=True, insert=False):
         self.validate()
 
+        changed_fields = self._changed_fields
+
+        if not insert and changed_fields is not None and 'id' not in changed_fields and self.id is not None:
+            if changed_fields:
+                self.__class__.objects.filter_by(id=self.id).update_one(self._get_changes(), safe=safe)
+                self._changed_fields = set()
+
+            return
+
         doc = self.to_mongo()
 
         try:
@@ -28,6 +39,26 @@ class Document(BaseDocument):
             raise OperationError(unicode(err))
 
         self['id'] = object_id
+        self._changed_fields = set()
+
+        identity_map = current_identity_map()
+
+        if identity_map is not None:
+            identity_map.invalidate(self.__class__, object_id)
+
+    def _get_changes(self):
+        update_spec = UpdateSpecification()
+
+        for name in self._changed_fields:
+            field = self._fields[name]
+            value = self._data.get(name)
+
+            if value is None:
+                update_spec['unset:' + field.db_field] = 1
+            else:
+                update_spec['set:' + field.db_field] = field.to_mongo(value)
+
+        return update_spec
 
     def delete(self, safe=False):
         #noinspection PyUnresolvedReferences
@@ -41,10 +72,8 @@ class Document(BaseDocument):
     def reload(self):
         data = self.__class__.objects.filter_by(id=self.id)._one()
 
-        #noinspection PyUnresolvedReferences
-        for field in self.__class__._fields.values():
-            if field.db_field in data:
-                self._data[field.name] = field.to_python(data[field.db_field])
+        self._hydrate(data)
+        self._changed_fields = set()
 
     @classmethod
     def drop_collection(cls):
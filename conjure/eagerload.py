@@ -1,14 +1,70 @@
 from collections import defaultdict
 from .exceptions import EagerloadException
+from .identity_map import current as current_identity_map
+import threading
 
-__all__ = ['Eagerload']
+__all__ = ['Eagerload', 'Siblings']
 
 ITERABLE_TYPES = (tuple, list, set)
 ITERABLE_FIELDS = {'ListField', 'MapField'}
 
 
+def _reference(field):
+    if field.__class__.__name__ in ITERABLE_FIELDS:
+        field = field.field
+
+    if hasattr(field, 'document_cls'):
+        return field
+
+    return None
+
+
+def _root(document_cls):
+    for superclass in document_cls._superclasses.itervalues():
+        if not superclass._superclasses:
+            return superclass
+
+    return document_cls
+
+
+def _applies(expr, document_cls):
+    owner = getattr(expr, 'owner', None)
+
+    if isinstance(owner, type) and hasattr(owner, '_meta') and not owner._meta['embedded']:
+        return issubclass(document_cls, owner) or issubclass(owner, document_cls)
+
+    return True
+
+
+def resolve_path(document_cls, path):
+    fields = []
+    field = None
+
+    for name in path.split('.'):
+        if field is None:
+            member = document_cls._fields.get(name)
+        else:
+            member = field.lookup_member(name)
+
+        if member is None:
+            raise EagerloadException('Cannot resolve "%s" in "%s"' % (name, path))
+
+        field = member
+        reference = _reference(field)
+
+        if reference is not None:
+            fields.append(field)
+            document_cls = reference.document_cls
+            field = None
+
+    if field is not None:
+        raise EagerloadException('"%s" does not end with a reference' % path)
+
+    return fields
+
+
 class TargetField(object):
-    def __init__(self, field):
+    def __init__(self, field, only=None):
         key = field.get_key()
 
         try:
@@ -27,49 +83,86 @@ class TargetField(object):
             self.id_attr = field.name + '_id'
             self.iterable = False
 
+        self.root = _root(self.document_cls)
+        self.top_key = key.partition('.')[0]
+        self.only = only
+
 
 class Eagerload(object):
     def __init__(self, only=None):
         self.only = only
-        self.fields = []
-        self.mapping = defaultdict(list)
-        self.document_cls = None
+        self.levels = []
+
+    def add_field(self, field, level=0):
+        while len(self.levels) <= level:
+            self.levels.append([])
 
-    def add_field(self, field):
-        target_field = TargetField(field)
+        self.levels[level].append(TargetField(field, self.only))
 
-        if not self.document_cls:
-            self.document_cls = target_field.document_cls
-        elif self.document_cls is not target_field.document_cls:
-            raise EagerloadException('All fields must load the same document.')
+        return self
 
-        self.fields.append(target_field)
+    def add_path(self, document_cls, path):
+        for level, field in enumerate(resolve_path(document_cls, path)):
+            self.add_field(field, level)
 
         return self
 
-    def add_documents(self, documents):
-        if not isinstance(documents, ITERABLE_TYPES):
-            self.add_document(documents)
-        else:
-            for document in documents:
-                self.add_document(document)
+    def merge(self, other):
+        for level, fields in enumerate(other.levels):
+            while len(self.levels) <= level:
+                self.levels.append([])
+
+            self.levels[level].extend(fields)
+
         return self
 
+    def loader(self):
+        return Loader(self.levels)
+
+    def add_documents(self, documents):
+        return self.loader().add_documents(documents)
+
     def add_document(self, document):
-        for field in self.fields:
-            if field.field_attr:
-                documents = getattr(document, field.field_attr)
-                if not isinstance(documents, ITERABLE_TYPES):
-                    documents = [documents]
-            else:
-                documents = [document]
+        return self.add_documents([document])
+
+
+class Loader(object):
+    def __init__(self, levels):
+        self.levels = levels
+        self.mapping = defaultdict(list)
 
-            for doc in documents:
-                self._add_document(field, doc)
+    def add_documents(self, documents):
+        if self.levels:
+            self._map(self.levels[0], documents, self.mapping)
 
         return self
 
-    def _add_document(self, field, document):
+    def add_document(self, document):
+        return self.add_documents([document])
+
+    def _map(self, fields, documents, mapping):
+        if not isinstance(documents, ITERABLE_TYPES):
+            documents = [documents]
+
+        for document in documents:
+            for field in fields:
+                if field.field_attr:
+                    docs = document
+
+                    for attr in field.field_attr.split('.'):
+                        docs = getattr(docs, attr, None)
+
+                    if docs is None:
+                        continue
+                    elif not isinstance(docs, ITERABLE_TYPES):
+                        docs = [docs]
+                else:
+                    docs = [document]
+
+                for doc in docs:
+                    self._add_document(field, doc, mapping)
+
+    def _add_document(self, field, document, mapping):
         try:
             ids = getattr(document, field.id_attr)
         except AttributeError:
@@ -85,23 +178,121 @@ class Eagerload(object):
                 gen = enumerate(ids)
 
             for k, v in gen:
-                self.mapping[v].append((k, document._data[field.name]))
+                mapping[(field.root, v)].append((field.document_cls, k, document._data[field.name]))
         else:
-            self.mapping[ids].append((field.name, document._data))
+            mapping[(field.root, ids)].append((field.document_cls, field.name, document._data))
 
-    def flush(self):
-        if not self.mapping:
-            return
+    def _projection(self, root, fields, next_fields):
+        only = []
+
+        for field in fields:
+            if field.root is not root:
+                continue
+
+            if field.only is None:
+                return None
+
+            only.extend(expr for expr in field.only if _applies(expr, field.document_cls))
+
+        if not only:
+            return None
+
+        only.extend(field.top_key for field in next_fields)
 
+        return only
+
+    def _fetch(self, queries):
+        results = {}
+        errors = []
+        identity_map = current_identity_map()
+
+        def fetch(root, q, ids):
+            try:
+                if identity_map is not None:
+                    with identity_map:
+                        results[root] = q.in_bulk(ids)
+                else:
+                    results[root] = q.in_bulk(ids)
+            except Exception, e:
+                errors.append(e)
+
+        if len(queries) == 1:
+            root, q, ids = queries[0]
+            return {root: q.in_bulk(ids)}
+
+        threads = [threading.Thread(target=fetch, args=query) for query in queries]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def flush(self):
         mapping = self.mapping
-        cls = self.document_cls
-        ids = mapping.keys()
+        self.mapping = defaultdict(list)
+
+        for level, fields in enumerate(self.levels):
+            if not mapping:
+                break
+
+            next_fields = self.levels[level + 1] if level + 1 < len(self.levels) else []
+
+            ids = defaultdict(set)
+
+            for root, object_id in mapping:
+                ids[root].add(object_id)
+
+            queries = []
+
+            for root, object_ids in ids.iteritems():
+                q = root.objects
+                only = self._projection(root, fields, next_fields)
+
+                if only is not None:
+                    q.only(*only)
+
+                queries.append((root, q, list(object_ids)))
+
+            results = self._fetch(queries)
+            loaded = []
 
-        cursor = cls.objects.filter(cls.id == ids[0] if len(ids) == 1 else cls.id.in_(ids))
+            for (root, object_id), targets in mapping.iteritems():
+                document = results[root].get(object_id)
+
+                if document is None:
+                    continue
+
+                loaded.append(document)
+
+                for document_cls, key, data in targets:
+                    if isinstance(document, document_cls):
+                        # Loading references does not modify the document, so bypass BaseList/BaseDict change tracking.
+                        (list if isinstance(data, list) else dict).__setitem__(data, key, document)
+
+            mapping = defaultdict(list)
+
+            if next_fields:
+                self._map(next_fields, loaded, mapping)
+
+
+class Siblings(object):
+    def __init__(self, documents):
+        self.documents = documents
+        self.loaded = set()
+
+        for document in documents:
+            document._siblings = self
+
+    def load(self, field):
+        if field.name in self.loaded:
+            return
 
-        if self.only is not None:
-            cursor.only(*self.only)
+        self.loaded.add(field.name)
 
-        for document in cursor:
-            for key, data in mapping[document._data['id']]:
-                data[key] = document
\ No newline at end of file
+        Eagerload(_reference(field)._lazyload_only).add_field(field).add_documents(self.documents).flush()
@@ -15,7 +15,9 @@ class ValidationError(DocumentError):
 
 
 class OperationError(DocumentError):
-    pass
+    def __init__(self, message, errors=None):
+        DocumentError.__init__(self, message)
+        self.errors = errors or []
 
 
 class DoesNotExist(DocumentError):
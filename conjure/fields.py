@@ -1,5 +1,5 @@
 import time
-from .base import BaseField, ObjectIdField
+from .base import BaseField, BaseList, BaseDict, BaseDocument, ObjectIdField
 from .operations import String, Number, Common, List, Reference
 from .exceptions import ValidationError
 from .documents import Document
@@ -159,29 +159,34 @@ class ListField(List, BaseField):
             return self
 
         if isinstance(self.field, ReferenceField):
-            referenced_cls = self.field.document_cls
-            lazyload_only = self.field._lazyload_only
+            if instance._siblings is not None and instance._data.get(self.name):
+                instance._siblings.load(self)
 
             value_list = instance._data.get(self.name)
 
-            if value_list:
+            documents = self.field.dereference(value_list or [])
+
+            if documents:
                 deref_list = []
 
                 for value in value_list:
-                    if not isinstance(value, Document):
-                        if value is not None:
-                            q = referenced_cls.objects.filter_by(id=value)
-
-                            if lazyload_only:
-                                q = q.only(*lazyload_only)
-
-                            deref_list.append(q.one())
-                    else:
+                    if isinstance(value, Document):
                         deref_list.append(value)
+                    elif value is not None:
+                        document = documents.get(value)
+
+                        # References to documents which no longer exist are dropped rather than loaded as None.
+                        if document is not None:
+                            deref_list.append(document)
 
                 instance._data[self.name] = deref_list
 
-        return BaseField.__get__(self, instance, owner)
+        value = BaseField.__get__(self, instance, owner)
+
+        if isinstance(value, list) and not isinstance(value, BaseList):
+            value = instance._data[self.name] = BaseList(value, instance, self.name)
+
+        return value
 
     def to_python(self, value):
         return [self.field.to_python(item) for item in value]
@@ -215,7 +220,7 @@ class ListField(List, BaseField):
                     if isinstance(value, Document):
                         value = value.id
 
-                    value_list[i] = value
+                    list.__setitem__(value_list, i, value)
 
             return value_list
 
@@ -234,6 +239,17 @@ class MapField(BaseField):
         self.field = field
         BaseField.__init__(self, **kwargs)
 
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = BaseField.__get__(self, instance, owner)
+
+        if isinstance(value, dict) and not isinstance(value, BaseDict):
+            value = instance._data[self.name] = BaseDict(value, instance, self.name)
+
+        return value
+
     def to_python(self, value):
         return dict((k, self.field.to_python(item)) for k, item in value.iteritems())
 
@@ -267,8 +283,9 @@ class MapField(BaseField):
                     for e in expressions:
                         def wrap(name):
                             if e.is_query():
+                                name, ops = name
                                 left, _, right = name.partition(self.field.name)
-                                return left + self.get_key(False) + right
+                                return left + self.get_key(False) + right, ops
                             elif e.is_update():
                                 left, _, right = name.rpartition(self.field.name)
                                 return left + self.get_key(True) + right
@@ -316,6 +333,17 @@ class EmbeddedDocumentField(BaseField):
 
         BaseField.__init__(self, **kwargs)
 
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = BaseField.__get__(self, instance, owner)
+
+        if isinstance(value, BaseDocument):
+            value._parent = (instance, self.name)
+
+        return value
+
     def to_python(self, value):
         if not isinstance(value, self.document):
             return self.document.to_python(value)
@@ -374,17 +402,38 @@ class ReferenceField(BaseField, Reference):
 
         value = instance._data.get(self.name)
 
+        if value is not None and not isinstance(value, Document) and instance._siblings is not None:
+            instance._siblings.load(self)
+            value = instance._data.get(self.name)
+
         if not isinstance(value, Document):
             if value is not None:
-                q = self.document_cls.objects.filter_by(id=value)
+                q = self.document_cls.objects
 
                 if self._lazyload_only:
                     q = q.only(*self._lazyload_only)
 
-                instance._data[self.name] = q.one()
+                instance._data[self.name] = q.with_id(value)
 
         return BaseField.__get__(self, instance, owner)
 
+    def dereference(self, values):
+        document_cls = self.document_cls
+        id_field = document_cls._fields['id']
+        ids = set(value for value in values if value is not None and not isinstance(value, Document))
+
+        if not ids:
+            return {}
+
+        q = document_cls.objects
+
+        if self._lazyload_only:
+            q = q.only(*self._lazyload_only)
+
+        documents = q.in_bulk(ids)
+
+        return dict((value, documents.get(id_field.to_mongo(value))) for value in ids)
+
     def to_mongo(self, document):
         field = self.document_cls._fields['id']
 
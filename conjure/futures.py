@@ -0,0 +1,72 @@
+from .identity_map import current as current_identity_map
+import threading
+
+__all__ = ['Future', 'submit', 'gather']
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+POOL_SIZE = 10
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                from multiprocessing.pool import ThreadPool
+                _pool = ThreadPool(POOL_SIZE)
+
+    return _pool
+
+
+class Future(object):
+    def __init__(self, result):
+        self._result = result
+
+    def result(self, timeout=None):
+        return self._result.get(timeout)
+
+    def done(self):
+        return self._result.ready()
+
+
+def submit(fn, *args, **kwargs):
+    # Identity maps lock internally, so the caller's map can be shared with the pool.
+    identity_map = current_identity_map()
+
+    def call():
+        if identity_map is not None:
+            with identity_map:
+                return fn(*args, **kwargs)
+
+        return fn(*args, **kwargs)
+
+    if gevent is not None:
+        return Future(gevent.spawn(call))
+
+    return Future(_get_pool().apply_async(call))
+
+
+def gather(*futures, **kwargs):
+    timeout = kwargs.get('timeout')
+    return [future.result(timeout) for future in futures]
+
+
+class Background(object):
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        method = getattr(self._target, name)
+
+        def call(*args, **kwargs):
+            return submit(method, *args, **kwargs)
+
+        return call
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import threading
+
+__all__ = ['IdentityMap']
+
+_local = threading.local()
+
+
+def current():
+    stack = getattr(_local, 'stack', None)
+
+    if stack:
+        return stack[-1]
+
+    return None
+
+
+def projection_key(fields):
+    if fields is None:
+        return None
+
+    try:
+        return frozenset(fields.iteritems())
+    except TypeError:
+        raise ValueError('Projection can not be used as an identity map key')
+
+
+class IdentityMap(object):
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._documents = OrderedDict()
+        # Eagerloads and futures share the map of the calling thread with worker threads.
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+
+        if stack is None:
+            stack = _local.stack = []
+
+        stack.append(self)
+
+        return self
+
+    def __exit__(self, *_):
+        _local.stack.remove(self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._documents)
+
+    @staticmethod
+    def _key(document_cls, object_id):
+        return document_cls._meta['db'], document_cls._meta['collection'], object_id
+
+    def get(self, document_cls, object_id, fields=None):
+        key = self._key(document_cls, object_id)
+
+        with self._lock:
+            projections = self._documents.pop(key, None)
+
+            if projections is None:
+                return None
+
+            self._documents[key] = projections
+
+        for projection in (None, fields):
+            document = projections.get(projection)
+
+            if isinstance(document, document_cls):
+                return document
+
+        return None
+
+    def add(self, document, fields=None):
+        key = self._key(document.__class__, document._data.get('id'))
+
+        with self._lock:
+            projections = self._documents.pop(key, None) or {}
+            projections[fields] = document
+
+            self._documents[key] = projections
+
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+        return document
+
+    def invalidate(self, document_cls, object_id=None):
+        with self._lock:
+            if object_id is not None:
+                self._documents.pop(self._key(document_cls, object_id), None)
+            else:
+                db, collection, _ = self._key(document_cls, None)
+
+                for key in self._documents.keys():
+                    if key[0] == db and key[1] == collection:
+                        del self._documents[key]
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
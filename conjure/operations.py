@@ -1,11 +1,20 @@
 from .spec import Equal, NotEqual, LessThan, LessThanEqual, GreaterThan, GreaterThanEqual, In, NotIn, \
-    Exists, Type, Where, UpdateSpecification, Mod, All, Size, Slice, QuerySpecification, Match
+    Exists, Type, Where, UpdateSpecification, Mod, All, Size, Slice, QuerySpecification, Match, Parameter
+from .exceptions import InvalidQueryError
 import types
 import re
 
 __all__ = ['Common', 'String', 'Number', 'List', 'Reference']
 
 
+def _literal(value, op):
+    # Parameters are only substituted where they end up verbatim in the compiled query.
+    if isinstance(value, Parameter):
+        raise InvalidQueryError('Parameter "%s" can not be used with %s()' % (value.name, op))
+
+    return value
+
+
 class _Base(object):
     def get_key(self, *args, **kwargs):
         raise NotImplemented
@@ -73,7 +82,7 @@ class Common(_Base):
         raise NotImplementedError()
 
     def set(self, val):
-        self._validate(val)
+        self._validate(_literal(val, 'set'))
         return UpdateSpecification(['set', self.get_key(True), self.to_mongo(val)])
 
     def unset(self):
@@ -82,28 +91,28 @@ class Common(_Base):
 
 class String(_Base):
     def startswith(self, value):
-        return self.re(r'^%s' % value)
+        return self.re(r'^%s' % _literal(value, 'startswith'))
 
     def istartswith(self, value):
-        return self.ire(r'^%s' % value)
+        return self.ire(r'^%s' % _literal(value, 'istartswith'))
 
     def endswith(self, value):
-        return self.re(r'%s$' % value)
+        return self.re(r'%s$' % _literal(value, 'endswith'))
 
     def iendswith(self, value):
-        return self.ire(r'%s$' % value)
+        return self.ire(r'%s$' % _literal(value, 'iendswith'))
 
     def contains(self, value):
-        return self.re(r'%s' % value)
+        return self.re(r'%s' % _literal(value, 'contains'))
 
     def icontains(self, value):
-        return self.ire(r'%s' % value)
+        return self.ire(r'%s' % _literal(value, 'icontains'))
 
     def re(self, pattern):
-        return Equal([self.get_key(), '', re.compile(pattern)])
+        return Equal([self.get_key(), '', re.compile(_literal(pattern, 're'))])
 
     def ire(self, pattern):
-        return Equal([self.get_key(), '', re.compile(pattern, re.IGNORECASE)])
+        return Equal([self.get_key(), '', re.compile(_literal(pattern, 'ire'), re.IGNORECASE)])
 
 
 class Number(_Base):
@@ -111,14 +120,14 @@ class Number(_Base):
         return self.inc(val)
 
     def inc(self, val=1):
-        self._validate(val)
+        self._validate(_literal(val, 'inc'))
         return UpdateSpecification(['inc', self.get_key(True), val])
 
     def __sub__(self, val):
         return self.dec(val)
 
     def dec(self, val=1):
-        self._validate(val)
+        self._validate(_literal(val, 'dec'))
         return UpdateSpecification(['inc', self.get_key(True), -val])
 
     def __mod__(self, other):
@@ -172,7 +181,7 @@ class List(_Base):
         return self.add_to_set(val)
 
     def add_to_set(self, val):
-        self.field._validate(val)
+        self.field._validate(_literal(val, 'add_to_set'))
         return UpdateSpecification(['addToSet', self.get_key(True), self.field.to_mongo(val)])
 
     def __add__(self, val):
@@ -182,14 +191,15 @@ class List(_Base):
             return self.push(val)
 
     def push(self, val):
-        self.field._validate(val)
+        self.field._validate(_literal(val, 'push'))
         return UpdateSpecification(['push', self.get_key(True), self.field.to_mongo(val)])
 
     def push_all(self, val):
         if type(val) not in [types.ListType, types.TupleType]:
             raise TypeError()
 
-        map(self.field._validate, val)
+        for item in val:
+            self.field._validate(_literal(item, 'push_all'))
         return UpdateSpecification(['pushAll', self.get_key(True), map(self.field.to_mongo, val)])
 
     def __sub__(self, val):
@@ -199,6 +209,8 @@ class List(_Base):
             return self.pull(val)
 
     def pull(self, val):
+        _literal(val, 'pull')
+
         if isinstance(val, QuerySpecification):
             val = val.compile(self.get_key(True))
 
@@ -208,10 +220,13 @@ class List(_Base):
         if type(val) not in [types.ListType, types.TupleType]:
             raise TypeError()
 
+        for item in val:
+            _literal(item, 'pull_all')
+
         return UpdateSpecification(['pullAll', self.get_key(True), val])
 
     def replace_with(self, val):
-        self.field._validate(val)
+        self.field._validate(_literal(val, 'replace_with'))
         return UpdateSpecification(['set', self.get_key(True) + '.$', self.field.to_mongo(val)])
 
     def __mod__(self, val):
@@ -219,32 +234,42 @@ class List(_Base):
 
 
 class Reference(Common):
+    def _convert(self, value):
+        if isinstance(value, Parameter):
+            return value.bind(self.to_mongo)
+
+        return self.to_mongo(value)
+
+    def _convert_each(self, values):
+        if isinstance(values, Parameter):
+            return values.bind(self.to_mongo, each=True)
+
+        return [self._convert(value) for value in values]
+
     def eq(self, other):
-        return Common.eq(self, self.to_mongo(other))
+        return Common.eq(self, self._convert(other))
 
     def ne(self, other):
-        return Common.ne(self, self.to_mongo(other))
+        return Common.ne(self, self._convert(other))
 
     def lt(self, other):
-        return Common.lt(self, self.to_mongo(other))
+        return Common.lt(self, self._convert(other))
 
     def lte(self, other):
-        return Common.lte(self, self.to_mongo(other))
+        return Common.lte(self, self._convert(other))
 
     def gt(self, other):
-        return Common.gt(self, self.to_mongo(other))
+        return Common.gt(self, self._convert(other))
 
     def gte(self, other):
-        return Common.gte(self, self.to_mongo(other))
+        return Common.gte(self, self._convert(other))
 
     def in_(self, vals):
-        vals = [self.to_mongo(val) for val in vals]
-        return Common.in_(self, vals)
+        return Common.in_(self, self._convert_each(vals))
 
     def nin(self, vals):
-        vals = [self.to_mongo(val) for val in vals]
-        return Common.nin(self, vals)
+        return Common.nin(self, self._convert_each(vals))
 
     def set(self, val):
-        self._validate(val)
+        self._validate(_literal(val, 'set'))
         return Common.set(self, self.to_mongo(val))
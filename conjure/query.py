@@ -1,28 +1,78 @@
 from .connection import connect
-from .spec import QuerySpecification, Slice
-from .exceptions import DoesNotExist, OperationError
-from .eagerload import Eagerload
+from .spec import QuerySpecification, Slice, Parameter, Params
+from .exceptions import DoesNotExist, OperationError, InvalidQueryError, ValidationError
+from .eagerload import Eagerload, Siblings
+from .futures import Background
+from .identity_map import current as current_identity_map, projection_key
 from .utils import lookup_field
+from bson.objectid import ObjectId
 import copy
+import itertools
 import pymongo
 import pymongo.errors
 import pprint
 import re
 
+CHUNK_SIZE = 1000
+
+# OP_QUERY wire protocol flags.
+NO_CURSOR_TIMEOUT = 16
+EXHAUST = 64
+
+
+def _get_value(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+
+        data = data.get(key)
+
+    return data
+
+
+def _template(value):
+    if isinstance(value, Parameter):
+        return value.resolve
+    elif isinstance(value, dict):
+        items = value.iteritems()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return None
+
+    builders = [(k, build) for k, build in ((k, _template(v)) for k, v in items) if build is not None]
+
+    if not builders:
+        return None
+
+    def build(values):
+        copied = copy.copy(value)
+
+        for k, builder in builders:
+            copied[k] = builder(values)
+
+        return copied
+
+    return build
+
 
 class Manager(object):
     def __init__(self):
-        self._collection = None
+        self._cached = None, None
 
     def __get__(self, instance, owner):
         if instance is not None:
             return self
 
-        if self._collection is None:
-            db = connect(owner._meta['db'])
-            self._collection = db[owner._meta['collection']]
+        # Resolved on every access so that re-registering a connection alias takes effect.
+        db = connect(owner._meta['db'], owner._meta['alias'])
+        cached_db, collection = self._cached
+
+        if cached_db is not db:
+            collection = db[owner._meta['collection']]
+            self._cached = db, collection
 
-        return Query(owner, self._collection)
+        return Query(owner, collection)
 
 
 class Query(object):
@@ -32,25 +82,94 @@ class Query(object):
         self._spec = QuerySpecification(None)
         self._pymongo_cursor = None
         self._fields = None
-        self._eagerloads = []
-        self._deferred_sort = []
+        self._eagerloads = ()
+        self._deferred_sort = ()
+        self._batch_lazyload = False
+        self._chunk_size = CHUNK_SIZE
+        self._batch_size = None
+        self._max_time_ms = None
+        self._query_options = 0
+        self._values = None
+        self._filter = None
+        self._read_preference = None
+        self._tag_sets = None
 
     def clone(self):
-        q = Query(self._document_cls, self._collection)
+        q = copy.copy(self)
         q._spec = self._spec.clone()
-        q._fields = copy.deepcopy(self._fields)
-        q._eagerloads = copy.deepcopy(self._eagerloads)
-        q._deferred_sort = copy.deepcopy(self._deferred_sort)
+        q._pymongo_cursor = None
         return q
 
+    def _session(self):
+        identity_map = current_identity_map()
+
+        if identity_map is not None:
+            try:
+                return identity_map, projection_key(self._fields)
+            except ValueError:
+                pass
+
+        return None, None
+
+    def _invalidate(self):
+        identity_map = current_identity_map()
+
+        if identity_map is not None:
+            object_id = self._compile_spec().get('_id')
+
+            if object_id is None or isinstance(object_id, dict):
+                identity_map.invalidate(self._document_cls)
+            else:
+                identity_map.invalidate(self._document_cls, object_id)
+
+    def _to_python(self, data):
+        document = self._document_cls.to_python(data)
+
+        if document is not None:
+            identity_map, fields = self._session()
+
+            if identity_map is not None:
+                identity_map.add(document, fields)
+
+        return document
+
     def _compile_spec(self):
+        if self._filter is not None:
+            if not self._spec.empty():
+                raise InvalidQueryError('A bound prepared query can not be filtered further')
+
+            return self._filter
+
         spec = self._spec.compile()
 
         if self._document_cls._superclasses:
+            spec = dict(spec)
             spec['_cls'] = re.compile('^' + self._document_cls._name)
 
         return spec
 
+    def prepare(self, builder):
+        return PreparedQuery(self.clone().filter(builder(Params())))
+
+    def _read_options(self):
+        read_preference = self._read_preference
+
+        if read_preference is None and self._document_cls is not None:
+            read_preference = self._document_cls._meta['read_preference']
+
+        if read_preference is None:
+            return {}
+
+        if isinstance(read_preference, basestring):
+            read_preference = getattr(pymongo.ReadPreference, read_preference.upper())
+
+        options = {'read_preference': read_preference}
+
+        if self._tag_sets is not None:
+            options['tag_sets'] = self._tag_sets
+
+        return options
+
     def _transform_key_list(self, keys):
         transformed_keys = []
 
@@ -71,15 +190,41 @@ class Query(object):
 
     def eagerload(self, *fields, **kwargs):
         eagerload = Eagerload(kwargs.get('only'))
-        map(eagerload.add_field, fields)
-        self._eagerloads.append(eagerload)
+
+        for field in fields:
+            if isinstance(field, basestring):
+                eagerload.add_path(self._document_cls, field)
+            elif isinstance(field, (list, tuple)):
+                for level, level_field in enumerate(field):
+                    eagerload.add_field(level_field, level)
+            else:
+                eagerload.add_field(field)
+
+        self._eagerloads += (eagerload,)
         return self
 
+    def batch_lazyload(self):
+        self._batch_lazyload = True
+        return self
+
+    def chunk_size(self, n):
+        self._chunk_size = n
+        return self
+
+    def _eagerload_plan(self):
+        if not self._eagerloads:
+            return None
+
+        plan = Eagerload()
+
+        for eagerload in self._eagerloads:
+            plan.merge(eagerload)
+
+        return plan
+
     def _eagerload(self, obj):
-        if obj:
-            for eagerload in self._eagerloads:
-                eagerload.add_documents(obj)
-                eagerload.flush()
+        if obj and self._eagerloads:
+            self._eagerload_plan().loader().add_documents(obj).flush()
 
         return obj
 
@@ -95,15 +240,15 @@ class Query(object):
 
     def find(self, *expressions):
         if len(expressions) == 1 and isinstance(expressions[0], dict):
-            return self._collection.find(expressions[0], fields=self._fields)
+            return self._collection.find(expressions[0], fields=self._fields, **self._read_options())
 
-        return self.filter(*expressions)._collection.find(self._compile_spec(), fields=self._fields)
+        return self.filter(*expressions)._collection.find(self._compile_spec(), fields=self._fields, **self._read_options())
 
     def find_one(self, *expressions):
         if len(expressions) == 1 and isinstance(expressions[0], dict):
-            return self._collection.find_one(expressions[0], fields=self._fields)
+            return self._collection.find_one(expressions[0], fields=self._fields, **self._read_options())
 
-        return self.filter(*expressions)._collection.find_one(self._compile_spec(), fields=self._fields)
+        return self.filter(*expressions)._collection.find_one(self._compile_spec(), fields=self._fields, **self._read_options())
 
     def filter(self, *expressions):
         for expression in expressions:
@@ -129,11 +274,23 @@ class Query(object):
 
         return self
 
+    def _load(self, data):
+        if self._values is not None:
+            return None if data is None else self._values(data)
+
+        return self._eagerload(self._to_python(data))
+
     def one(self):
-        return self._eagerload(self._document_cls.to_python(self._one()))
+        return self._load(self._one())
 
     def _one(self):
-        return self._collection.find_one(self._compile_spec(), fields=self._fields)
+        if self._max_time_ms is None:
+            return self._collection.find_one(self._compile_spec(), fields=self._fields, **self._read_options())
+
+        for obj in self._collection.find(self._compile_spec(), fields=self._fields, **self._read_options()).max_time_ms(self._max_time_ms).limit(-1):
+            return obj
+
+        return None
 
     def first(self, *expressions):
         try:
@@ -144,21 +301,57 @@ class Query(object):
     def all(self):
         return [doc for doc in self]
 
+    def background(self):
+        return Background(self.clone())
+
+    def _cacheable(self):
+        # Only a plain lookup by id can be answered with a document from the identity map.
+        return self._spec.empty() and self._filter is None and self._values is None
+
     def with_id(self, object_id):
-        return self.filter_by(id=self._document_cls.id.to_mongo(object_id)).one()
+        object_id = self._document_cls.id.to_mongo(object_id)
+        identity_map, fields = self._session()
+
+        if identity_map is not None and self._cacheable():
+            document = identity_map.get(self._document_cls, object_id, fields)
+
+            if document is not None:
+                return document
+
+        return self.filter_by(id=object_id).one()
 
     def in_bulk(self, object_ids):
         field = self._document_cls.id
-        return  dict([(doc.id, doc) for doc in self.filter(field.in_(map(field.to_mongo, object_ids)))])
+        object_ids = map(field.to_mongo, object_ids)
+        documents = {}
+        identity_map, fields = self._session()
+
+        if identity_map is not None and self._cacheable():
+            for object_id in object_ids:
+                document = identity_map.get(self._document_cls, object_id, fields)
+
+                if document is not None:
+                    documents[object_id] = document
+
+            object_ids = [object_id for object_id in object_ids if object_id not in documents]
+
+        if object_ids:
+            documents.update((doc.id, doc) for doc in self.filter(field.in_(object_ids)))
+
+        return documents
 
     def next(self):
         try:
-            obj = self._document_cls.to_python(self._cursor.next())
+            while True:
+                data = self._cursor.next()
 
-            if not obj:
-                return self.next()
+                if self._values is not None:
+                    return self._values(data)
 
-            return obj
+                obj = self._to_python(data)
+
+                if obj:
+                    return obj
         except StopIteration, e:
             self.rewind()
             raise e
@@ -181,12 +374,53 @@ class Query(object):
         self._cursor.skip(n)
         return self
 
+    def batch_size(self, n):
+        self._batch_size = n
+
+        if self._pymongo_cursor is not None:
+            self._cursor.batch_size(n)
+
+        return self
+
+    def max_time_ms(self, ms):
+        self._max_time_ms = ms
+
+        if self._pymongo_cursor is not None:
+            self._cursor.max_time_ms(ms)
+
+        return self
+
+    def _add_option(self, mask):
+        self._query_options |= mask
+
+        if self._pymongo_cursor is not None:
+            self._cursor.add_option(mask)
+
+        return self
+
+    def read_preference(self, read_preference, tag_sets=None):
+        if self._pymongo_cursor is not None:
+            raise InvalidQueryError('Read preference must be set before the query is executed')
+
+        self._read_preference = read_preference
+        self._tag_sets = tag_sets
+        return self
+
+    def secondary_ok(self):
+        return self.read_preference(pymongo.ReadPreference.SECONDARY_PREFERRED)
+
+    def no_cursor_timeout(self):
+        return self._add_option(NO_CURSOR_TIMEOUT)
+
+    def exhaust(self):
+        return self._add_option(EXHAUST)
+
     def __getitem__(self, key):
         if isinstance(key, slice):
             self._pymongo_cursor = self._cursor[key]
             return self
         elif isinstance(key, int):
-            return self._eagerload(self._document_cls.to_python(self._cursor[key]))
+            return self._load(self._cursor[key])
 
     def only(self, *exprs):
         self._fields = {'_cls': 1}
@@ -205,9 +439,70 @@ class Query(object):
 
         return self
 
+    def _values_plan(self, exprs):
+        plan = []
+
+        for expr in exprs:
+            if isinstance(expr, basestring):
+                try:
+                    field = lookup_field(self._document_cls, expr)
+                except KeyError:
+                    raise InvalidQueryError('Cannot resolve field "%s"' % expr)
+
+                name = expr
+            else:
+                field = expr
+                name = expr.name
+
+            plan.append((name, field.get_key(False).split('.'), None if field.python_is_identity() else field.to_python))
+
+        self.only(*exprs)
+
+        return plan
+
+    def values(self, *exprs):
+        plan = self._values_plan(exprs)
+
+        def convert(data):
+            values = {}
+
+            for name, path, converter in plan:
+                value = _get_value(data, path)
+                values[name] = value if value is None or converter is None else converter(value)
+
+            return values
+
+        self._values = convert
+        return self
+
+    def values_list(self, *exprs, **kwargs):
+        plan = self._values_plan(exprs)
+
+        if kwargs.get('flat'):
+            if len(plan) != 1:
+                raise InvalidQueryError('flat is only valid with a single field')
+
+            _, path, converter = plan[0]
+
+            def convert(data):
+                value = _get_value(data, path)
+                return value if value is None or converter is None else converter(value)
+        else:
+            def convert(data):
+                values = []
+
+                for _, path, converter in plan:
+                    value = _get_value(data, path)
+                    values.append(value if value is None or converter is None else converter(value))
+
+                return tuple(values)
+
+        self._values = convert
+        return self
+
     def sort(self, key_list):
         if self._pymongo_cursor is None:
-            self._deferred_sort.append(key_list)
+            self._deferred_sort += (self._transform_key_list(key_list),)
         else:
             self._cursor.sort(self._transform_key_list(key_list))
 
@@ -222,9 +517,12 @@ class Query(object):
         return plan
 
     def delete(self, safe=False):
+        self._invalidate()
         return self._collection.remove(self._compile_spec(), safe=safe)
 
     def _update(self, update, safe, upsert, multi):
+        self._invalidate()
+
         try:
             self._collection.update(self._compile_spec(), update, safe=safe, upsert=upsert, multi=multi)
         except pymongo.errors.OperationFailure, err:
@@ -239,30 +537,141 @@ class Query(object):
     def upsert(self, update_spec, safe=False):
         self._update(update_spec.compile(), safe, True, False)
 
+    def insert_many(self, documents, ordered=False, batch_size=1000, validate=True):
+        documents = iter(documents)
+        inserted = []
+        errors = []
+        offset = 0
+
+        while True:
+            batch = list(itertools.islice(documents, batch_size))
+
+            if not batch:
+                break
+
+            if not self._insert_batch(batch, offset, ordered, validate, inserted, errors) and ordered:
+                break
+
+            offset += len(batch)
+
+        if errors:
+            raise OperationError('%d document(s) could not be inserted' % len(errors), errors)
+
+        return inserted
+
+    def _insert_batch(self, batch, offset, ordered, validate, inserted, errors):
+        if ordered:
+            bulk = self._collection.initialize_ordered_bulk_op()
+        else:
+            bulk = self._collection.initialize_unordered_bulk_op()
+
+        pending = []
+        failed = {}
+
+        for index, document in enumerate(batch, offset):
+            if validate:
+                try:
+                    document.validate()
+                except ValidationError, err:
+                    errors.append({'index': index, 'document': document, 'code': None, 'message': unicode(err)})
+
+                    if ordered:
+                        break
+
+                    continue
+
+            data = document.to_mongo()
+
+            if data.get('_id') is None:
+                data['_id'] = ObjectId()
+
+            bulk.insert(data)
+            pending.append((index, document, data['_id']))
+
+        if pending:
+            try:
+                bulk.execute()
+            except pymongo.errors.BulkWriteError, err:
+                for error in err.details.get('writeErrors', []):
+                    failed[error['index']] = error
+            except pymongo.errors.OperationFailure, err:
+                raise OperationError(unicode(err))
+
+        for position, (index, document, object_id) in enumerate(pending):
+            error = failed.get(position)
+
+            if error is not None:
+                errors.append({'index': index, 'document': document, 'code': error.get('code'), 'message': error.get('errmsg')})
+
+                if ordered:
+                    break
+
+                continue
+
+            document['id'] = object_id
+            document._changed_fields = set()
+            inserted.append(document)
+
+        errors.sort(key=lambda error: error['index'])
+
+        return not failed and len(pending) == len(batch)
+
     def group(self, key, initial, reduce, finalize=None):
         return self._collection.group(key, self._compile_spec(), initial, reduce, finalize)
 
     def __iter__(self):
-        if self._eagerloads:
-            documents = []
+        if self._values is None and (self._eagerloads or self._batch_lazyload):
+            return self._iter_chunked()
 
-            for obj in self._cursor:
-                document = self._document_cls.to_python(obj)
+        return self
 
-                if document:
-                    documents.append(document)
+    def _iter_chunks(self):
+        chunk = []
 
-            return self._eagerload(documents).__iter__()
+        for obj in self._cursor:
+            document = self._to_python(obj)
 
-        return self
+            if document:
+                chunk.append(document)
+
+                if len(chunk) >= self._chunk_size:
+                    yield chunk
+                    chunk = []
+
+        if chunk:
+            yield chunk
+
+        self.rewind()
+
+    def _iter_chunked(self):
+        plan = self._eagerload_plan()
+
+        for chunk in self._iter_chunks():
+            if self._batch_lazyload:
+                Siblings(chunk)
+
+            if plan is not None:
+                plan.loader().add_documents(chunk).flush()
+
+            for document in chunk:
+                yield document
 
     @property
     def _cursor(self):
         if self._pymongo_cursor is None:
-            self._pymongo_cursor = self._collection.find(self._compile_spec(), fields=self._fields)
+            self._pymongo_cursor = self._collection.find(self._compile_spec(), fields=self._fields, **self._read_options())
 
             for key_list in self._deferred_sort:
-                self.sort(key_list)
+                self._pymongo_cursor.sort(key_list)
+
+            if self._batch_size is not None:
+                self._pymongo_cursor.batch_size(self._batch_size)
+
+            if self._max_time_ms is not None:
+                self._pymongo_cursor.max_time_ms(self._max_time_ms)
+
+            if self._query_options:
+                self._pymongo_cursor.add_option(self._query_options)
 
         return self._pymongo_cursor
 
@@ -274,3 +683,18 @@ class Query(object):
             return self._document_cls._search_index.search(*args, **kwargs)
 
         raise AttributeError()
+
+
+class PreparedQuery(object):
+    def __init__(self, query):
+        spec = query._compile_spec()
+        self._query = query
+        self._build = _template(spec) or (lambda values: spec)
+
+    def bind(self, **values):
+        q = self._query.clone()
+        q._spec = QuerySpecification(None)
+        q._filter = self._build(values)
+        return q
+
+    __call__ = bind
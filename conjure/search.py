@@ -1,14 +1,25 @@
 import collections
+import itertools
 import multiprocessing
 import pyes
 from pyes.exceptions import NotFoundException
 import pymongo
+import pymongo.errors
 import logging
+import threading
 import time
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
+from bson.timestamp import Timestamp
 from .spec import QuerySpecification
 from .oplog_watcher import OplogWatcher
+from .eagerload import _reference
+from .base import ObjectIdField
+from .fields import DateTimeField
 import base64
+import datetime
+import json
+import os
 
 _indexes = []
 _connections = {}
@@ -45,6 +56,8 @@ class IndexMeta(type):
             'host': getattr(meta, 'host'),
             'model': getattr(meta, 'model'),
             'spec': getattr(meta, 'spec', QuerySpecification()),
+            'replicas': getattr(meta, 'replicas', 1),
+            'refresh_interval': getattr(meta, 'refresh_interval', '1s'),
         }
 
         new_cls = super_new(mcs, name, bases, attrs)
@@ -87,35 +100,130 @@ class Index(object):
 
         return self._connection
 
-    def search(self, query, page=1, limit=5, filters=None):
-        return search(self, query, page, limit, filters)
+    def search(self, query, page=1, limit=5, filters=None, only=None):
+        return search(self, query, page, limit, filters, only)
+
+    def search_source(self, query, page=1, limit=5, filters=None):
+        return search(self, query, page, limit, filters, source=True)
+
+    def parse_source(self, source):
+        parsers = getattr(self, '_parsers', None)
+
+        if parsers is None:
+            parsers = self._parsers = [(term.name, term.index_name, term.parser(self.model))
+                                       for term in self.terms.itervalues() if term.index]
+
+        values = {}
+
+        for name, index_name, parse in parsers:
+            value = source.get(index_name)
+            values[name] = value if value is None or parse is None else parse(value)
+
+        return values
 
     def indexer(self):
         return Indexer(self)
 
 
 class Term(object):
-    def __init__(self, index_name=None, index=True, boost=1.0, null_value=None, coerce=None):
+    def __init__(self, index_name=None, index=True, boost=1.0, null_value=None, coerce=None, parse=None):
         self.name = None
         self.index_name = index_name
         self.index = index
         self.boost = boost
         self.null_value = null_value
         self.coerce = coerce
+        self.parse = parse
+
+    def parser(self, model):
+        if self.parse is not None:
+            return self.parse
+
+        field = model._fields.get(self.name)
+
+        if field is None or _reference(field) is not None:
+            return None
+        elif isinstance(field, ObjectIdField):
+            parse = field.to_mongo
+        elif isinstance(field, DateTimeField):
+            parse = _parse_datetime
+        elif field.python_is_identity():
+            return None
+        else:
+            parse = field.to_python
+
+        if self.coerce is None:
+            return parse
+
+        # What a coerced value looks like is up to the coerce function, so keep it as is when it can't be read back.
+        def parse_coerced(value):
+            try:
+                return parse(value)
+            except (ValueError, TypeError, InvalidId):
+                return value
+
+        return parse_coerced
+
+
+def _parse_datetime(value):
+    if isinstance(value, (int, long, float)):
+        return datetime.datetime.fromtimestamp(value)
+
+    value = value.rstrip('Z')
+
+    for pattern in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, pattern)
+        except ValueError:
+            pass
+
+    raise ValueError('Invalid datetime "%s"' % value)
+
+
+class SourceResult(object):
+    def __init__(self, index, id, values):
+        self.index = index
+        self.id = id
+        self._values = values
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['_values'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def load(self, only=None):
+        objects = self.index.model.objects
+
+        if only:
+            objects.only(*only)
+
+        return objects.with_id(self.id)
+
+    def __repr__(self):
+        return '<SourceResult %s %s>' % (self.index.doc_type, self.id)
 
 
 class Indexer(object):
-    def __init__(self, index):
+    def __init__(self, index, connection=None, namespace=None):
         self.index = index
+        self.connection = connection or index.connection
+        self.namespace = namespace or index.namespace
 
     def index_document(self, obj, bulk=False):
+        self.index_values(obj.id, self._values(obj), bulk)
+
+    def _document(self, values):
         doc = {}
 
         for term in self.index.terms.values():
             if not term.index:
                 continue
 
-            value = getattr(obj, term.name)
+            value = values.get(term.name)
 
             if value is not None:
                 if isinstance(value, ObjectId):
@@ -126,24 +234,34 @@ class Indexer(object):
 
                 doc[term.index_name] = value
 
-        self._execute(self.index.connection.index, doc, self.index.namespace,
-                      self.index.doc_type, id=base64.b64encode(str(obj.id)), bulk=bulk)
+        return doc
+
+    def _values(self, obj):
+        return dict((term.name, getattr(obj, term.name)) for term in self.index.terms.itervalues() if term.index)
+
+    def index_values(self, object_id, values, bulk=False):
+        self._execute(self.connection.index, self._document(values), self.namespace,
+                      self.index.doc_type, id=base64.b64encode(str(object_id)), bulk=bulk)
 
-    def delete_document(self, doc_id):
-        self._execute(self.index.connection.delete, self.index.namespace,
-            self.index.doc_type, base64.b64encode(str(doc_id)))
+    def delete_document(self, doc_id, bulk=False):
+        self._execute(self.connection.delete, self.namespace,
+            self.index.doc_type, base64.b64encode(str(doc_id)), bulk=bulk)
 
     def insert(self, obj):
         obj = self.index.model.to_python(obj)
         logging.info('Indexing %s (%s)' % (self.index.model._name, obj.id))
         self.index_document(obj)
 
-    def update(self, obj_id, raw):
+    def _affects(self, raw):
         o = raw['o']
+        fields = self.index.terms.keys()
 
+        return o.has_key('$set') and len(set(fields) - set(o['$set'].keys())) < len(fields)
+
+    def update(self, obj_id, raw):
         fields = self.index.terms.keys()
 
-        if o.has_key('$set') and len(set(fields) - set(o['$set'].keys())) < len(fields):
+        if self._affects(raw):
             obj = self.index.model.objects.only(*fields).filter(self.index.spec).with_id(obj_id)
 
             if obj is not None:
@@ -171,6 +289,129 @@ class Indexer(object):
                 time.sleep(1)
 
 
+class BufferedIndexer(Indexer):
+    def __init__(self, index, interval=1.0, max_size=1000, max_pending=10000, max_backoff=60):
+        Indexer.__init__(self, index)
+        self.interval = interval
+        self.max_size = max_size
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._pending = collections.OrderedDict()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _add(self, obj_id, op, values=None, inserted=False):
+        with self._condition:
+            while len(self._pending) >= self.max_pending and obj_id not in self._pending:
+                self._condition.wait(self.interval)
+
+            previous = self._pending.pop(obj_id, None)
+
+            if previous is not None:
+                inserted = previous[2]
+
+            # A document inserted and deleted within the same window never has to reach the index.
+            if not (op == 'delete' and inserted):
+                self._pending[obj_id] = op, values, inserted
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+            if len(self._pending) >= self.max_size:
+                self._condition.notify_all()
+
+    def insert(self, obj):
+        obj = self.index.model.to_python(obj)
+        self._add(obj.id, 'index', self._values(obj), inserted=True)
+
+    def update(self, obj_id, raw):
+        if self._affects(raw):
+            self._add(obj_id, 'update')
+
+    def delete(self, obj_id):
+        self._add(obj_id, 'delete')
+
+    def _take(self):
+        with self._condition:
+            if len(self._pending) < self.max_size:
+                self._condition.wait(self.interval)
+
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+            self._condition.notify_all()
+
+        return pending
+
+    def _restore(self, pending):
+        with self._condition:
+            for obj_id, (op, values, _) in pending.iteritems():
+                if obj_id not in self._pending:
+                    self._pending[obj_id] = op, values, False
+
+    def _run(self):
+        connection = pyes.ES(self.index._meta['host'], bulk_size=self.max_size)
+        backoff = 1
+
+        while True:
+            pending = self._take()
+
+            if not pending:
+                continue
+
+            try:
+                self._send(connection, pending)
+                backoff = 1
+            except Exception:
+                logging.warning('Failed to flush %d operation(s), retrying in %ds' % (len(pending), backoff),
+                                exc_info=True)
+                self._restore(pending)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _send(self, connection, pending):
+        updates = [obj_id for obj_id, (op, _, _) in pending.iteritems() if op == 'update']
+
+        if updates:
+            fields = self.index.terms.keys()
+            objects = self.index.model.objects.only(*fields).filter(self.index.spec).in_bulk(updates)
+        else:
+            objects = {}
+
+        for obj_id, (op, values, _) in pending.iteritems():
+            if op == 'update':
+                obj = objects.get(self.index.model.id.to_mongo(obj_id))
+
+                if obj is None:
+                    op = 'delete'
+                else:
+                    op, values = 'index', self._values(obj)
+
+            doc_id = base64.b64encode(str(obj_id))
+
+            if op == 'index':
+                connection.index(self._document(values), self.namespace, self.index.doc_type, id=doc_id, bulk=True)
+            else:
+                connection.delete(self.namespace, self.index.doc_type, doc_id, bulk=True)
+
+        connection.force_bulk()
+
+        logging.info('Flushed %d operation(s) for %s' % (len(pending), self.index.namespace))
+
+    def flush(self):
+        with self._condition:
+            pending = self._pending
+            self._pending = collections.OrderedDict()
+            self._condition.notify_all()
+
+        if pending:
+            self._send(self.connection, pending)
+
+
 class ResultSet(object):
     def __init__(self, objects=None, total=0, elapsed_time=0, max_score=0):
         self.objects = objects or []
@@ -195,12 +436,52 @@ class ResultSet(object):
             yield obj, self.meta[obj]
 
 
-def search(indexes, query, page=1, limit=5, filters=None):
+def _resolve_hits(found, hits):
+    resolved = []
+
+    for hit in hits:
+        namespace = hit['_index']
+
+        if namespace not in found:
+            namespace = namespace.rpartition('-')[0]
+
+        index = found[namespace]
+        resolved.append((index, index.model.id.to_mongo(base64.b64decode(hit['_id']))))
+
+    return resolved
+
+
+def _load_hits(found, hits, only=None):
+    resolved = _resolve_hits(found, hits)
+    ids = collections.defaultdict(list)
+
+    for index, object_id in resolved:
+        ids[index].append(object_id)
+
+    documents = {}
+
+    for index, object_ids in ids.iteritems():
+        objects = index.model.objects
+
+        if only:
+            objects.only(*only)
+
+        documents[index] = objects.in_bulk(object_ids)
+
+    return [documents[index].get(object_id) for index, object_id in resolved]
+
+
+def _source_hits(found, hits):
+    return [SourceResult(index, object_id, index.parse_source(hit.get('_source') or {}))
+            for hit, (index, object_id) in zip(hits, _resolve_hits(found, hits))]
+
+
+def search(indexes, query, page=1, limit=5, filters=None, only=None, source=False):
     if not isinstance(indexes, list):
         indexes = [indexes]
 
     namespaces = []
-    models = {}
+    found = {}
 
     for i, index in enumerate(indexes):
         if not isinstance(index, Index):
@@ -212,7 +493,7 @@ def search(indexes, query, page=1, limit=5, filters=None):
                     break
 
         namespaces.append(index.namespace)
-        models[index.namespace] = index.model
+        found[index.namespace] = index
 
     result_set = ResultSet()
     result_set.query = query
@@ -248,8 +529,15 @@ def search(indexes, query, page=1, limit=5, filters=None):
         result_set.elapsed_time = response._results['took'] / 1000.0
         result_set.max_score = response.max_score
 
-        for i, hit in enumerate(response.hits):
-            result_set.append(models[hit['_index']].objects.with_id(base64.b64decode(hit['_id'])), {
+        hits = list(response.hits)
+
+        if source:
+            objects = _source_hits(found, hits)
+        else:
+            objects = _load_hits(found, hits, only)
+
+        for i, (hit, obj) in enumerate(zip(hits, objects)):
+            result_set.append(obj, {
                 'rank': skip + i + 1,
                 'score': hit['_score'],
                 'relevance': int(hit['_score'] / result_set.max_score * 100)
@@ -260,36 +548,267 @@ def search(indexes, query, page=1, limit=5, filters=None):
     return result_set
 
 
-def reindex(only=None):
+def _split(index, n):
+    objects = index.model.objects.secondary_ok().filter(index.spec)
+
+    try:
+        first = objects.clone().sort('id').values_list('id', flat=True)[0]
+        last = objects.clone().sort('-id').values_list('id', flat=True)[0]
+    except IndexError:
+        return [(None, None)]
+
+    if not isinstance(first, ObjectId) or not isinstance(last, ObjectId) or n < 2:
+        return [(None, None)]
+
+    start = first.generation_time
+    step = (last.generation_time - start) / n
+
+    boundaries = sorted(set(str(ObjectId.from_datetime(start + step * i)) for i in xrange(1, n)))
+    boundaries = [boundary for boundary in boundaries if ObjectId(boundary) > first]
+
+    return zip([None] + boundaries, boundaries + [None])
+
+
+def _raw_terms(index):
+    for name in index.terms:
+        field = index.model._fields.get(name)
+
+        if field is None or _reference(field) is not None:
+            return False
+
+    return True
+
+
+def _reindex_range(args):
+    namespace, target, i, lower, upper, bulk_size, batch_size = args
+
+    index = [index for index in _indexes if index.namespace == namespace][0]
+    model = index.model
+    connection = pyes.ES(index._meta['host'], bulk_size=bulk_size)
+    indexer = Indexer(index, connection, target)
+
+    objects = model.objects.secondary_ok().filter(index.spec).batch_size(batch_size)
+
+    if lower is not None:
+        objects.filter(model.id >= ObjectId(lower))
+
+    if upper is not None:
+        objects.filter(model.id < ObjectId(upper))
+
+    count = 0
+
+    if _raw_terms(index):
+        # Raw values skip the field defaults a loaded document would fill in, so apply them here.
+        defaults = [(name, model._fields[name]) for name in index.terms if model._fields[name].has_default()]
+
+        for values in objects.values('id', *index.terms.keys()):
+            for name, field in defaults:
+                if values.get(name) is None:
+                    values[name] = field.get_default()
+
+            indexer.index_values(values['id'], values, bulk=True)
+            count += 1
+    else:
+        for obj in objects.only(*index.terms.keys()):
+            indexer.index_document(obj, bulk=True)
+            count += 1
+
+    connection.force_bulk()
+
+    return i, count
+
+
+def _load_state(path):
+    if path is None or not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(path, state):
+    if path is None:
+        return
+
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+
+    os.rename(path + '.tmp', path)
+
+
+def _oplog(index):
+    connection = pymongo.MongoClient(index.uri)
+
+    try:
+        connection.admin.command({'replSetGetStatus': 1})
+        return connection.local['oplog.rs']
+    except pymongo.errors.OperationFailure:
+        return connection.local['oplog.$main']
+
+
+def _oplog_position(index):
+    for entry in _oplog(index).find().sort('$natural', -1).limit(1):
+        return [entry['ts'].time, entry['ts'].inc]
+
+    return None
+
+
+def _oplog_entries(index, position):
+    return _oplog(index).find({'ts': {'$gt': Timestamp(*position)}, 'ns': index.namespace.replace('-', '.')})
+
+
+def _replay(index, target, position, bulk_size=1000, batch_size=1000):
+    """
+    Re-index every document touched in the oplog after `position` into `target`, so that changes
+    made while it was being built are not lost. Returns the position of the last entry replayed.
+    """
+    if position is None:
+        logging.warning('%s: no oplog available, changes made during the rebuild are not replayed' % index.namespace)
+        return position
+
+    ids = collections.OrderedDict()
+
+    for entry in _oplog_entries(index, position):
+        position = [entry['ts'].time, entry['ts'].inc]
+        obj_id = (entry.get('o2') or {}).get('_id', entry['o'].get('_id'))
+
+        if obj_id is not None:
+            ids[obj_id] = True
+
+    connection = pyes.ES(index._meta['host'], bulk_size=bulk_size)
+    indexer = Indexer(index, connection, target)
+    ids = ids.keys()
+
+    for i in xrange(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        objects = index.model.objects.only(*index.terms.keys()).filter(index.spec).in_bulk(batch)
+
+        for obj_id in batch:
+            obj = objects.get(obj_id)
+
+            if obj is None:
+                indexer.delete_document(obj_id, bulk=True)
+            else:
+                indexer.index_document(obj, bulk=True)
+
+    connection.force_bulk()
+
+    logging.info('%s: replayed %d change(s)' % (index.namespace, len(ids)))
+
+    return position
+
+
+def _swap(index, target):
+    connection = index.connection
+
+    connection.update_settings(target, {'index': {
+        'number_of_replicas': index._meta['replicas'],
+        'refresh_interval': index._meta['refresh_interval'],
+    }})
+    connection.refresh(target)
+
+    try:
+        aliased = connection.get_alias(index.namespace)
+    except pyes.exceptions.IndexMissingException:
+        aliased = []
+
+    if index.namespace in aliased or (not aliased and connection.exists_index(index.namespace)):
+        # Indexes built before aliases were used live under the alias name itself.
+        connection.delete_index(index.namespace)
+        aliased = []
+
+    previous = [name for name in aliased if name != target]
+
+    commands = [('remove', name, index.namespace) for name in previous]
+    commands.append(('add', target, index.namespace))
+    connection.change_aliases(commands)
+
+    for name in previous:
+        connection.delete_index(name)
+
+    logging.info('%s now points to %s' % (index.namespace, target))
+
+
+def reindex(only=None, processes=None, bulk_size=1000, batch_size=1000, resume=None):
     logging.info('Reindexing...')
 
+    processes = processes or multiprocessing.cpu_count()
+    state = _load_state(resume)
+
     for index in _indexes:
         if only and index.namespace not in only:
             continue
 
+        progress = state.get(index.namespace)
+
+        if progress is None:
+            target = '%s-%s' % (index.namespace, time.strftime('%Y%m%d%H%M%S'))
+
+            index.connection.create_index(target, {'index': {'number_of_replicas': 0, 'refresh_interval': '-1'}})
+
+            progress = state[index.namespace] = {
+                'target': target,
+                'position': _oplog_position(index),
+                'ranges': _split(index, processes * 4),
+                'done': []
+            }
+            _save_state(resume, state)
+
+        elif progress.get('swapped'):
+            continue
+
+        target = progress['target']
+        ranges = progress['ranges']
+        done = progress['done']
+        tasks = [(index.namespace, target, i, lower, upper, bulk_size, batch_size)
+                 for i, (lower, upper) in enumerate(ranges) if i not in done]
+
+        logging.info('%s: %d of %d range(s) left' % (index.namespace, len(tasks), len(ranges)))
+
+        if processes > 1:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(_reindex_range, tasks)
+        else:
+            pool = None
+            results = itertools.imap(_reindex_range, tasks)
+
+        started = time.time()
+        total = 0
+
         try:
-            index.connection.delete_index(index.namespace)
-        except pyes.exceptions.IndexMissingException:
-            pass
+            for i, count in results:
+                done.append(i)
+                total += count
+                _save_state(resume, state)
 
-        index.connection.create_index(index.namespace)
+                elapsed = time.time() - started
+                logging.info('%s: %d/%d range(s), %d object(s), %.0f/s' % (
+                    index.namespace, len(done), len(ranges), total, total / elapsed if elapsed else 0))
+        except BaseException:
+            # Ranges still running would never be recorded as done, so don't wait for them.
+            if pool is not None:
+                pool.terminate()
+                pool.join()
 
-        objects = index.model.objects.only(*index.terms.keys()).filter(index.spec)
-        count = objects.count()
+            raise
 
-        logging.info('%d object(s) from %s' % (count, index.namespace))
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-        indexer = Indexer(index)
+        progress['position'] = _replay(index, target, progress['position'], bulk_size, batch_size)
+        _save_state(resume, state)
 
-        for i, obj in enumerate(objects):
-            i += 1
+        _swap(index, target)
 
-            if not i % 10000:
-                logging.info('%d/%d', i, count)
+        # Changes the watcher sent to the old index between the replay and the swap.
+        _replay(index, target, progress['position'], bulk_size, batch_size)
 
-            indexer.index_document(obj, bulk=True)
+        progress['swapped'] = True
+        _save_state(resume, state)
 
-        indexer.index.connection.force_bulk()
+    if resume is not None and os.path.exists(resume):
+        os.remove(resume)
 
     logging.info('Done!')
 
@@ -310,7 +829,7 @@ def watch():
         oplog_watcher = OplogWatcher(pymongo.Connection(uri), namespaces=namespaces)
 
         for index in indexes:
-            indexer = index.indexer()
+            indexer = BufferedIndexer(index)
 
             for op in ('insert', 'update', 'delete',):
                 oplog_watcher.add_handler(index.namespace.replace('-', '.'), op, getattr(indexer, op))
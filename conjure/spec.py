@@ -1,9 +1,82 @@
+from .exceptions import InvalidQueryError
 import copy
 import types
 import collections
-import re
-try: import cPickle as pickle
-except ImportException: import pickle
+
+
+class Parameter(object):
+    def __init__(self, name, convert=None, each=False):
+        self.name = name
+        self.convert = convert
+        self.each = each
+
+    def bind(self, convert, each=False):
+        return Parameter(self.name, convert, each)
+
+    def resolve(self, values):
+        try:
+            value = values[self.name]
+        except KeyError:
+            raise InvalidQueryError('Missing value for parameter "%s"' % self.name)
+
+        if self.convert is None:
+            return value
+        elif self.each:
+            return [self.convert(v) for v in value]
+
+        return self.convert(value)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return '<Parameter %s>' % self.name
+
+
+class Params(object):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return Parameter(name)
+
+
+def _copy(value):
+    # Containers are copied so callers can't mutate a spec through them, leaves (e.g. compiled regexes) are shared.
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    elif isinstance(value, dict):
+        copied = copy.copy(value)
+
+        for k, v in value.iteritems():
+            copied[k] = _copy(v)
+
+        return copied
+    elif isinstance(value, set):
+        return set(value)
+
+    return value
+
+
+def _flatten(tree):
+    expressions = {}
+    stack = [tree]
+
+    while stack:
+        node = stack.pop()
+
+        if type(node) == types.TupleType:
+            stack.append(node[1])
+            stack.append(node[0])
+            continue
+
+        for expr, val in node.iteritems():
+            if expr == OR and OR in expressions:
+                val = expressions[OR] + val
+
+            expressions[expr] = val
+
+    return expressions
 
 
 class Specification(object):
@@ -14,14 +87,33 @@ class Specification(object):
         if type(expressions) == types.ListType:
             self.expressions = {}
             self._set_expression(*expressions)
+        elif isinstance(expressions, Specification):
+            self.expressions = dict(expressions.expressions)
         elif expressions is not None:
             self.expressions = expressions
         else:
             self.expressions = {}
 
+    @property
+    def expressions(self):
+        return self._expressions
+
+    @expressions.setter
+    def expressions(self, expressions):
+        self._expressions = expressions
+        self._compiled = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled'] = {}
+        return state
+
     def to_dict(self):
         raise NotImplemented
 
+    def empty(self):
+        return not self.expressions
+
     def clone(self):
         return copy.deepcopy(self)
 
@@ -47,9 +139,11 @@ class Specification(object):
         return self.expressions.__getitem__(k)
 
     def __setitem__(self, k, v):
+        self._compiled = {}
         return self.expressions.__setitem__(k, v)
 
     def __delitem__(self, k):
+        self._compiled = {}
         return self.expressions.__delitem__(k)
 
     def is_update(self):
@@ -61,6 +155,14 @@ class Specification(object):
 
 class UpdateSpecification(Specification):
     def compile(self):
+        compiled = self._compiled.get('')
+
+        if compiled is None:
+            compiled = self._compiled[''] = self._compile()
+
+        return compiled
+
+    def _compile(self):
         d = collections.defaultdict(dict)
 
         for key in self:
@@ -72,9 +174,6 @@ class UpdateSpecification(Specification):
     def _set_expression(self, op, k, v):
         self.expressions[op + ':' + k] = v
 
-    def empty(self):
-        return not self.expressions
-
     def __and__(self, other):
         spec = self.clone()
 
@@ -93,15 +192,49 @@ class UpdateSpecification(Specification):
 
 
 class QuerySpecification(Specification):
+    @property
+    def expressions(self):
+        if type(self._tree) == types.TupleType:
+            self._tree = _flatten(self._tree)
+
+        return self._tree
+
+    @expressions.setter
+    def expressions(self, expressions):
+        self._tree = expressions
+        self._compiled = {}
+
+    def _derive(self, tree):
+        spec = object.__new__(self.__class__)
+        spec.expressions = tree
+        return spec
+
+    def __getstate__(self):
+        return {'_tree': self.expressions, '_compiled': {}}
+
+    def empty(self):
+        return not self._tree
+
+    def clone(self):
+        spec = self._derive(self._tree)
+        spec._compiled = self._compiled
+        return spec
+
     def compile(self, prefix=''):
-        d = {}
+        compiled = self._compiled.get(prefix)
 
-        for expr in self:
-            key, ops = self._parse_expression(expr)
-            val = self[expr]
+        if compiled is None:
+            compiled = self._compiled[prefix] = self._compile(prefix)
 
-            if prefix:
-                key = re.sub(r'^' + prefix + r'\.', '', key)
+        return compiled
+
+    def _compile(self, prefix):
+        d = {}
+        prefix = prefix + '.' if prefix else ''
+
+        for (key, ops), val in self.expressions.iteritems():
+            if prefix and key.startswith(prefix):
+                key = key[len(prefix):]
 
             if not key:
                 key = '$' + ops[0]
@@ -128,7 +261,7 @@ class QuerySpecification(Specification):
         return d
 
     def _set_expression(self, k, ops, v):
-        self.expressions[k + ':' + ':'.join(ops.split())] = v
+        self.expressions[(k, tuple(ops.split()))] = _copy(v)
 
     def _parse_expression(self, expr):
         if expr.startswith(':'):
@@ -138,66 +271,68 @@ class QuerySpecification(Specification):
         else:
             key, _, ops = expr.partition(':')
 
-        ops = ops.split(':')
+        return key, tuple(op for op in ops.split(':') if op)
 
-        try:
-            ops.remove('')
-        except ValueError:
-            pass
+    def _key(self, k):
+        if isinstance(k, basestring):
+            return self._parse_expression(k)
 
-        return key, ops
+        return k
 
-    def _invert_op(self, op):
-        spec = self.clone()
+    def __contains__(self, k):
+        return self._key(k) in self.expressions
 
-        for expr in self:
-            key, ops = self._parse_expression(expr)
+    def __getitem__(self, k):
+        return self.expressions[self._key(k)]
 
-            if op not in ops:
-                ops.insert(0, op)
-            else:
-                ops.remove(op)
+    def __setitem__(self, k, v):
+        expressions = dict(self.expressions)
+        expressions[self._key(k)] = _copy(v)
+        self.expressions = expressions
 
-            spec[key + ':' + ':'.join(ops)] = spec[expr]
+    def __delitem__(self, k):
+        expressions = dict(self.expressions)
+        del expressions[self._key(k)]
+        self.expressions = expressions
 
-            del spec[expr]
+    def _invert_op(self, op):
+        expressions = {}
 
-        return spec.expressions
+        for (key, ops), val in self.expressions.iteritems():
+            if op not in ops:
+                ops = (op,) + ops
+            else:
+                ops = tuple(o for o in ops if o != op)
 
-    def _swap_op(self, old_op, new_op):
-        spec = self.clone()
+            expressions[(key, ops)] = val
 
-        for expr in self:
-            key, ops = self._parse_expression(expr)
+        return expressions
 
-            ops[ops.index(old_op)] = new_op
+    def _swap_op(self, old_op, new_op):
+        expressions = {}
 
-            spec[key + ':' + ':'.join(ops)] = spec[expr]
-            del spec[expr]
+        for (key, ops), val in self.expressions.iteritems():
+            expressions[(key, tuple(new_op if o == old_op else o for o in ops))] = val
 
-        return spec.expressions
+        return expressions
 
     def __or__(self, other):
-        if ':or' in self.expressions:
-            spec = self.clone()
-            spec.expressions[':or'].append(other.compile())
-            return spec
+        if OR in self.expressions:
+            expressions = dict(self.expressions)
+            expressions[OR] = expressions[OR] + [other.compile()]
+            return self._derive(expressions)
 
         return QuerySpecification(['', 'or', [self.compile(), other.compile()]])
 
     __ior__ = __or__
 
     def __and__(self, other):
-        spec = self.clone()
-
-        for expr in other:
-            if expr in spec and expr == ':or':
-                spec[expr].extend(other[expr])
-                continue
+        if other.empty():
+            return self.clone()
+        elif self.empty():
+            return self._derive(other._tree)
 
-            spec[expr] = other[expr]
-
-        return spec
+        return self._derive((self._tree, other._tree))
 
     __iand__ = __and__
 
@@ -205,7 +340,10 @@ class QuerySpecification(Specification):
         return QuerySpecification(self._invert_op('not'))
 
     def __deepcopy__(self, memo):
-        return pickle.loads(pickle.dumps(self))
+        return self.clone()
+
+
+OR = ('', ('or',))
 
 
 class Equal(QuerySpecification):
@@ -0,0 +1,205 @@
+"""
+In-memory stand-in for the parts of pyes used by conjure.search, so the search
+tests can run without an ElasticSearch cluster. All ES instances pointing at the
+same server share state through `ES.clusters`.
+"""
+
+import collections
+import copy
+import datetime
+import json
+from .exceptions import ElasticSearchException, NotFoundException, IndexMissingException, IndexAlreadyExistsException
+
+
+def _encode(value):
+    # Documents go over the wire as JSON, so only what survives it comes back in _source.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+
+    raise TypeError(repr(value))
+
+
+class Cluster(object):
+    def __init__(self):
+        self.indices = collections.OrderedDict()
+        self.settings = {}
+        self.aliases = {}
+        self.calls = []
+        self.hits = None
+
+
+class ES(object):
+    clusters = {}
+
+    def __init__(self, server=None, bulk_size=400, **kwargs):
+        self.server = server
+        self.bulk_size = bulk_size
+        self.cluster = ES.clusters.setdefault(server, Cluster())
+        self._bulk = []
+
+    @classmethod
+    def reset(cls):
+        cls.clusters.clear()
+
+    def _record(self, name, *args):
+        self.cluster.calls.append((name,) + args)
+
+    def _resolve(self, name):
+        if name in self.cluster.aliases:
+            return sorted(self.cluster.aliases[name])
+
+        if name in self.cluster.indices:
+            return [name]
+
+        raise IndexMissingException('[%s] missing' % name)
+
+    def create_index(self, index, settings=None):
+        self._record('create_index', index)
+
+        if index in self.cluster.indices or index in self.cluster.aliases:
+            raise IndexAlreadyExistsException('[%s] Already exists' % index)
+
+        self.cluster.indices[index] = collections.OrderedDict()
+        self.cluster.settings[index] = copy.deepcopy(settings or {})
+
+    def exists_index(self, index):
+        return index in self.cluster.indices or index in self.cluster.aliases
+
+    def delete_index(self, index):
+        self._record('delete_index', index)
+
+        for name in self._resolve(index):
+            del self.cluster.indices[name]
+            del self.cluster.settings[name]
+
+            for indices in self.cluster.aliases.values():
+                indices.discard(name)
+
+    def update_settings(self, index, settings):
+        self._record('update_settings', index)
+
+        for name in self._resolve(index):
+            self.cluster.settings[name].update(copy.deepcopy(settings))
+
+    def refresh(self, index=None):
+        self._record('refresh', index)
+
+    def get_alias(self, alias):
+        # Like pyes 0.19, which lists the indices status() reports for the name, so a concrete index lists itself.
+        return self._resolve(alias)
+
+    def change_aliases(self, commands):
+        self._record('change_aliases', commands)
+
+        for command, index, alias in commands:
+            if command == 'add':
+                if alias in self.cluster.indices:
+                    raise IndexAlreadyExistsException('[%s] an index exists with the same name as the alias' % alias)
+
+                self.cluster.aliases.setdefault(alias, set()).add(index)
+            else:
+                self.cluster.aliases.get(alias, set()).discard(index)
+
+                if not self.cluster.aliases.get(alias, True):
+                    del self.cluster.aliases[alias]
+
+    def _writable(self, index):
+        if index in self.cluster.aliases:
+            names = self._resolve(index)
+
+            if len(names) != 1:
+                raise ElasticSearchException('Alias [%s] has more than one index' % index)
+
+            return names[0]
+
+        return index
+
+    def _apply(self, op, index, doc_id, doc=None):
+        index = self._writable(index)
+
+        if op == 'index':
+            self.cluster.indices.setdefault(index, collections.OrderedDict())[doc_id] = json.loads(json.dumps(doc, default=_encode))
+            self.cluster.settings.setdefault(index, {})
+        elif self.cluster.indices.get(index, {}).pop(doc_id, None) is None:
+            raise NotFoundException('[%s][%s] missing' % (index, doc_id))
+
+    def index(self, doc, index, doc_type, id=None, bulk=False):
+        if bulk:
+            self._bulk.append(('index', index, id, doc))
+
+            if len(self._bulk) >= self.bulk_size:
+                self.force_bulk()
+        else:
+            self._apply('index', index, id, doc)
+
+    def delete(self, index, doc_type, id, bulk=False):
+        if bulk:
+            self._bulk.append(('delete', index, id, None))
+
+            if len(self._bulk) >= self.bulk_size:
+                self.force_bulk()
+        else:
+            self._apply('delete', index, id)
+
+    def force_bulk(self):
+        bulk = self._bulk
+        self._bulk = []
+
+        for op, index, doc_id, doc in bulk:
+            try:
+                self._apply(op, index, doc_id, doc)
+            except NotFoundException:
+                pass
+
+    def documents(self, index):
+        documents = {}
+
+        for name in self._resolve(index):
+            documents.update(self.cluster.indices[name])
+
+        return documents
+
+    def search(self, query, indices=None, **kwargs):
+        self._record('search', query, indices)
+
+        hits = self.cluster.hits
+
+        if hits is None:
+            hits = []
+
+            for alias in indices:
+                for name in self._resolve(alias):
+                    for doc_id, doc in self.cluster.indices[name].iteritems():
+                        hits.append({'_index': name, '_id': doc_id, '_score': 1.0, '_source': doc})
+
+        start = int(kwargs.get('from', 0))
+        size = int(kwargs.get('size', 10))
+
+        return ResultSet(hits[start:start + size], len(hits))
+
+
+class ResultSet(object):
+    def __init__(self, hits, total):
+        self.hits = hits
+        self.total = total
+        self.max_score = max([hit['_score'] for hit in hits] or [0])
+        self._results = {'took': 1}
+
+
+class StringQuery(object):
+    def __init__(self, query, **kwargs):
+        self.query = query
+
+
+class TermFilter(object):
+    def __init__(self):
+        self.terms = {}
+
+    def add(self, field, value):
+        self.terms[field] = value
+
+
+class FilteredQuery(object):
+    def __init__(self, query, filter):
+        self.query = query
+        self.filter = filter
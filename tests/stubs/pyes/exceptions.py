@@ -0,0 +1,18 @@
+class ElasticSearchException(Exception):
+    pass
+
+
+class NotFoundException(ElasticSearchException):
+    pass
+
+
+class IndexMissingException(ElasticSearchException):
+    pass
+
+
+class IndexAlreadyExistsException(ElasticSearchException):
+    pass
+
+
+class SearchPhaseExecutionException(ElasticSearchException):
+    pass
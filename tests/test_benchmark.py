@@ -0,0 +1,141 @@
+import unittest
+import datetime
+from conjure import documents, fields, query
+import bson
+import cPickle as pickle
+
+
+class BenchmarkTest(unittest.TestCase):
+    def setUp(self):
+        attrs = {}
+
+        for i in xrange(40):
+            attrs['generic_%d' % i] = fields.GenericField()
+            attrs['date_%d' % i] = fields.DateTimeField()
+            attrs['ref_%d' % i] = fields.ObjectIdField()
+
+        for i in xrange(10):
+            attrs['name_%d' % i] = fields.StringField()
+            attrs['count_%d' % i] = fields.IntegerField()
+
+        self.Wide = type('Wide', (documents.Document,), attrs)
+
+        now = datetime.datetime.now()
+
+        self.wide = {'_id': bson.ObjectId()}
+        self.sparse = {'_id': bson.ObjectId(), 'name_0': u'sparse', 'generic_3': 7, 'date_5': now}
+
+        for i in xrange(40):
+            self.wide['generic_%d' % i] = i
+            self.wide['date_%d' % i] = now
+            self.wide['ref_%d' % i] = bson.ObjectId()
+
+        for i in xrange(10):
+            self.wide['name_%d' % i] = u'name'
+            self.wide['count_%d' % i] = i
+
+    def naive_to_python(self, cls, data):
+        doc = cls()
+
+        for field in cls._fields.itervalues():
+            if field.db_field in data:
+                doc._data[field.name] = field.to_python(data[field.db_field])
+
+        return doc
+
+    def naive_save(self, doc):
+        for name, field in doc._fields.iteritems():
+            value = getattr(doc, name)
+
+            if value is not None:
+                field._validate(value)
+
+        data = {}
+
+        for name, field in doc._fields.iteritems():
+            value = doc._data.get(name)
+
+            if value is not None:
+                data[field.db_field] = field.to_mongo(value)
+
+        return data
+
+    def compiled_save(self, doc):
+        doc.validate()
+        return doc.to_mongo()
+
+    def naive_filter(self, specs):
+        spec = specs[0]
+
+        for other in specs[1:]:
+            spec = pickle.loads(pickle.dumps(spec))
+            spec.expressions.update(other.expressions)
+
+        return spec
+
+    def test_to_python(self):
+        Wide = self.Wide
+
+        for data in (self.wide, self.sparse):
+            self.assertEqual(Wide.to_python(data)._data, self.naive_to_python(Wide, data)._data)
+
+    def test_save(self):
+        Wide = self.Wide
+
+        for data in (self.wide, self.sparse):
+            doc = Wide.to_python(data)
+            self.assertEqual(self.compiled_save(doc), self.naive_save(doc))
+
+    def test_values(self):
+        convert = query.Query(self.Wide, None).values_list('id', 'name_0', 'count_0')._values
+
+        self.assertEqual(convert(self.wide), (self.wide['_id'], u'name', 0))
+
+    def test_compile_spec(self):
+        Wide = self.Wide
+        spec = Wide.name_0 == u'name'
+
+        for i in xrange(10):
+            spec &= getattr(Wide, 'count_%d' % i) > i
+            spec &= getattr(Wide, 'generic_%d' % i).in_([i, i + 1])
+
+        spec |= Wide.name_1 != u'name'
+
+        self.assertEqual(spec.compile(), spec._compile(''))
+
+        spec &= Wide.name_2 == u'other'
+        self.assertEqual(spec.compile()['name_2'], u'other')
+
+    def test_filter(self):
+        Wide = self.Wide
+        specs = [getattr(Wide, 'generic_%d' % i).in_([i, i + 1]) for i in xrange(40)]
+
+        def persistent():
+            spec = specs[0]
+
+            for other in specs[1:]:
+                spec &= other
+
+            return spec.compile()
+
+        self.assertEqual(persistent(), self.naive_filter(specs).compile())
+
+    def test_prepare(self):
+        Wide = self.Wide
+        q = query.Query(Wide, None)
+
+        def build(p):
+            return (Wide.name_0 == p.name) & Wide.count_0.in_(p.counts) & (Wide.date_0 > p.since)
+
+        values = {'name': u'name', 'counts': [1, 2, 3], 'since': datetime.datetime(2012, 1, 1)}
+        literals = type('Values', (object,), values)
+        prepared = q.prepare(build)
+
+        adhoc = lambda: q.clone().filter(build(literals))._compile_spec()
+        bound = lambda: prepared.bind(**values)._compile_spec()
+
+        self.assertEqual(bound(), adhoc())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+import time
+from conjure import documents, fields
+from conjure.bulk import BulkWriter, IncrementBuffer
+from conjure.exceptions import InvalidQueryError, OperationError
+import pymongo.errors
+
+
+class BulkTest(unittest.TestCase):
+    def setUp(self):
+        class Counter(documents.Document):
+            name = fields.StringField()
+            value = fields.IntegerField()
+            tags = fields.ListField(fields.StringField())
+
+        self.Counter = Counter
+
+    def tearDown(self):
+        self.Counter.drop_collection()
+
+    def test_bulk_writer(self):
+        Counter = self.Counter
+
+        a = Counter(name='a', value=1)
+        a.save()
+        b = Counter(name='b', value=1)
+        b.save()
+        Counter(name='c', value=1).save()
+
+        writer = BulkWriter(Counter, batch_size=2)
+        writer.update_one(Counter.objects.filter_by(id=a.id), Counter.value + 5)
+        writer.update_one(Counter.id == b.id, Counter.tags + 'x')
+        self.assertEqual(len(writer), 0)
+
+        writer.upsert(Counter.name == 'd', Counter.value.set(3))
+        writer.delete(Counter.name == 'c')
+        writer.update(Counter.value > 0, Counter.value + 1)
+
+        result = writer.flush()
+
+        self.assertEqual(result['nRemoved'], 1)
+        self.assertEqual(result['nUpserted'], 1)
+        self.assertEqual([upserted['index'] for upserted in result['upserted']], [2])
+        self.assertEqual(result['nMatched'], 5)
+
+        self.assertEqual(Counter.objects.with_id(a.id).value, 7)
+        self.assertEqual(Counter.objects.with_id(b.id).tags, ['x'])
+        self.assertEqual(Counter.objects.filter_by(name='d').one().value, 4)
+        self.assertEqual(Counter.objects.count(), 3)
+
+        with BulkWriter(Counter, ordered=True) as writer:
+            writer.delete_one(Counter.name == 'd')
+
+        self.assertEqual(Counter.objects.count(), 2)
+
+    def test_increment_buffer(self):
+        Counter = self.Counter
+
+        a = Counter(name='a', value=0)
+        a.save()
+        b = Counter(name='b', value=0)
+        b.save()
+
+        buffer = IncrementBuffer(interval=None, max_size=3)
+
+        for _ in xrange(10):
+            buffer.add(Counter, a.id, Counter.value + 1)
+
+        buffer.add(Counter, str(a.id), Counter.value - 3)
+        buffer.add(Counter, b.id, Counter.value + 2)
+
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(Counter.objects.with_id(a.id).value, 0)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(Counter.objects.with_id(a.id).value, 7)
+        self.assertEqual(Counter.objects.with_id(b.id).value, 2)
+
+        c = Counter(name='c', value=0)
+        c.save()
+
+        buffer.add(Counter, c.id, Counter.value + 1)
+        self.assertEqual(len(buffer), 1)
+        buffer.add(Counter, b.id, Counter.value + 1)
+        buffer.add(Counter, a.id, Counter.value + 1)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Counter.objects.with_id(c.id).value, 1)
+
+        self.assertRaises(InvalidQueryError, buffer.add, Counter, a.id, Counter.name.set('x'))
+
+        buffer = IncrementBuffer(interval=0.01)
+        buffer.add(Counter, c.id, Counter.value + 5)
+        time.sleep(0.2)
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Counter.objects.with_id(c.id).value, 6)
+        buffer.close()
+
+    def test_increment_buffer_failure(self):
+        Counter = self.Counter
+
+        a = Counter(name='a', value=0)
+        a.save()
+
+        buffer = IncrementBuffer(interval=None)
+        buffer.add(Counter, a.id, Counter.value + 5)
+
+        collection = Counter.objects._collection
+        initialize = collection.initialize_unordered_bulk_op
+
+        def failing():
+            bulk = initialize()
+
+            def execute():
+                raise pymongo.errors.OperationFailure('not master')
+
+            bulk.execute = execute
+            return bulk
+
+        collection.initialize_unordered_bulk_op = failing
+
+        try:
+            self.assertRaises(OperationError, buffer.flush)
+        finally:
+            collection.initialize_unordered_bulk_op = initialize
+
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual(Counter.objects.with_id(a.id).value, 0)
+
+        buffer.add(Counter, a.id, Counter.value + 1)
+        buffer.flush()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Counter.objects.with_id(a.id).value, 6)
+
+    def test_increment_buffer_write_errors(self):
+        Counter = self.Counter
+
+        class Visit(documents.Document):
+            hits = fields.IntegerField()
+
+        a = Counter(name='a', value=0)
+        a.save()
+        visit = Visit(hits=0)
+        visit.save()
+
+        buffer = IncrementBuffer(interval=None)
+        buffer.add(Counter, a.id, Counter.value + 5)
+        buffer.add(Visit, visit.id, Visit.hits + 1)
+
+        collection = Counter.objects._collection
+        initialize = collection.initialize_unordered_bulk_op
+
+        def failing():
+            bulk = initialize()
+
+            def execute():
+                raise pymongo.errors.BulkWriteError({
+                    'nMatched': 0, 'nModified': 0, 'nUpserted': 0, 'nRemoved': 0, 'upserted': [],
+                    'writeErrors': [{'index': 0, 'code': 16837, 'errmsg': 'Cannot apply $inc to a non-numeric value'}],
+                })
+
+            bulk.execute = execute
+            return bulk
+
+        collection.initialize_unordered_bulk_op = failing
+
+        try:
+            with self.assertRaises(OperationError) as context:
+                buffer.flush()
+        finally:
+            collection.initialize_unordered_bulk_op = initialize
+
+        self.assertEqual([error['document'] for error in context.exception.errors], ['Counter'])
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(Visit.objects.with_id(visit.id).hits, 1)
+        self.assertEqual(Counter.objects.with_id(a.id).value, 0)
+
+        Visit.drop_collection()
+
+
+if __name__ == '__main__':
+    unittest.main()
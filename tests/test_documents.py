@@ -1,7 +1,8 @@
 import unittest
 import datetime
 from conjure.documents import Document, EmbeddedDocument
-from conjure.fields import StringField, IntegerField, ReferenceField, DateTimeField, EmailField, ListField, EmbeddedDocumentField
+from conjure.fields import StringField, IntegerField, ReferenceField, DateTimeField, EmailField, ListField, EmbeddedDocumentField, \
+    MapField
 from conjure.exceptions import ValidationError
 from conjure.utils import Alias
 import bson
@@ -362,6 +363,108 @@ class DocumentTest(unittest.TestCase):
 
         BlogPost.drop_collection()
 
+    def test_save_changes(self):
+        class Comment(EmbeddedDocument):
+            content = StringField()
+
+        class BlogPost(Document):
+            title = StringField()
+            hits = IntegerField()
+            tags = ListField(StringField())
+            comment = EmbeddedDocumentField(Comment)
+
+        BlogPost.drop_collection()
+
+        post = BlogPost(title='Test Post', hits=5, tags=['test'], comment=Comment(content='test'))
+        post.save()
+
+        post_obj = BlogPost.objects.first()
+        self.assertEqual(post_obj._changed_fields, set())
+
+        BlogPost.objects.update_one(BlogPost.hits + 1)
+
+        post_obj.title = 'Changed Post'
+        self.assertEqual(post_obj._changed_fields, set(['title']))
+
+        post_obj.tags.append('mongo')
+        post_obj.comment.content = 'changed'
+        self.assertEqual(post_obj._changed_fields, set(['title', 'tags', 'comment']))
+
+        post_obj.save()
+        self.assertEqual(post_obj._changed_fields, set())
+
+        post.reload()
+        self.assertEqual(post.title, 'Changed Post')
+        self.assertEqual(post.tags, ['test', 'mongo'])
+        self.assertEqual(post.comment.content, 'changed')
+        self.assertEqual(post.hits, 6)
+
+        post_obj.title = None
+        post_obj.save()
+        self.assertFalse('title' in BlogPost.objects.find_one())
+
+        BlogPost.drop_collection()
+
+    def test_save_added_embedded_documents(self):
+        class Comment(EmbeddedDocument):
+            content = StringField()
+
+        class Section(EmbeddedDocument):
+            content = StringField()
+
+        class BlogPost(Document):
+            comments = ListField(EmbeddedDocumentField(Comment))
+            sections = MapField(EmbeddedDocumentField(Section))
+
+        BlogPost.drop_collection()
+
+        BlogPost(comments=[Comment(content='a')], sections={}).save()
+
+        post = BlogPost.objects.first()
+
+        adds = [
+            (post.comments.append, Comment),
+            (lambda c: post.comments.insert(0, c), Comment),
+            (lambda c: post.comments.extend([c]), Comment),
+            (lambda c: post.comments.__setitem__(0, c), Comment),
+            (lambda c: post.sections.__setitem__('intro', c), Section),
+            (lambda c: post.sections.update(outro=c), Section),
+        ]
+
+        for add, document_cls in adds:
+            document = document_cls(content='b')
+            add(document)
+            post.save()
+
+            document.content = 'changed'
+            self.assertEqual(len(post._changed_fields), 1)
+            post.save()
+
+        stored = BlogPost.objects.find_one()
+        self.assertEqual([c['content'] for c in stored['comments']], ['changed', 'a', 'changed', 'changed'])
+        self.assertEqual(stored['sections'], {'intro': {'content': 'changed'}, 'outro': {'content': 'changed'}})
+
+        BlogPost.drop_collection()
+
+    def test_save_does_not_dereference(self):
+        class BlogPost(Document):
+            content = StringField()
+            author = ReferenceField(self.User)
+
+        BlogPost.drop_collection()
+
+        author = self.User(name='Test User')
+        author.save()
+
+        post = BlogPost(content='Nothing to see here.')
+        post._data['author'] = author.id
+        post.save()
+
+        self.assertTrue(isinstance(post._data['author'], bson.objectid.ObjectId))
+        self.assertEqual(BlogPost.objects.find_one()['author'], author.id)
+
+        BlogPost.drop_collection()
+
     def test_meta_cls(self):
         class Test(EmbeddedDocument):
             name = IntegerField()
@@ -1,5 +1,6 @@
 import unittest
 from conjure.documents import Document, EmbeddedDocument
+from conjure.exceptions import EagerloadException
 from conjure.fields import StringField, ReferenceField, IntegerField, EmbeddedDocumentField, ListField
 
 class EagerloadTest(unittest.TestCase):
@@ -46,6 +47,9 @@ class EagerloadTest(unittest.TestCase):
 
         self.assertEqual(author1, post._data['author'])
 
+        posts = BlogPost.objects.eagerload(BlogPost.author).chunk_size(2)
+        self.assertEqual([type(post._data['author']) for post in posts], [User, User, User])
+
         for post in BlogPost.objects.eagerload(BlogPost.author, Comment.by, BlogPost.likes, only=[User.name]):
             self.assertEqual(type(post._data['author']), User)
 
@@ -56,4 +60,96 @@ class EagerloadTest(unittest.TestCase):
                 self.assertEqual(type(like), User)
 
         User.drop_collection()
-        BlogPost.drop_collection()
\ No newline at end of file
+        BlogPost.drop_collection()
+
+    def test_batch_lazyload(self):
+        class User(Document):
+            name = StringField()
+
+        class BlogPost(Document):
+            content = StringField()
+            author = ReferenceField(User)
+            likes = ListField(ReferenceField(User))
+
+        User.drop_collection()
+        BlogPost.drop_collection()
+
+        author1 = User(name='Test User #1')
+        author1.save()
+
+        author2 = User(name='Test User #2')
+        author2.save()
+
+        BlogPost(content='Test Post #1', author=author1, likes=[author2]).save()
+        BlogPost(content='Test Post #2', author=author2, likes=[author1, author2]).save()
+        BlogPost(content='Test Post #3', author=author1).save()
+
+        posts = list(BlogPost.objects.batch_lazyload().chunk_size(2))
+
+        self.assertEqual(posts[0].author.name, 'Test User #1')
+        self.assertEqual(type(posts[1]._data['author']), User)
+        self.assertNotEqual(type(posts[2]._data['author']), User)
+
+        self.assertEqual(posts[0].likes[0].name, 'Test User #2')
+        self.assertEqual([type(like) for like in posts[1]._data['likes']], [User, User])
+
+        self.assertEqual(posts[2].author.name, 'Test User #1')
+
+        User.drop_collection()
+        BlogPost.drop_collection()
+
+    def test_multi_level_eagerload(self):
+        class Company(Document):
+            name = StringField()
+
+        class User(Document):
+            name = StringField()
+            company = ReferenceField(Company)
+
+        class Tag(Document):
+            name = StringField()
+
+        class Comment(EmbeddedDocument):
+            by = ReferenceField(User)
+
+        class BlogPost(Document):
+            author = ReferenceField(User)
+            comments = ListField(EmbeddedDocumentField(Comment))
+            tags = ListField(ReferenceField(Tag))
+
+        Company.drop_collection()
+        User.drop_collection()
+        Tag.drop_collection()
+        BlogPost.drop_collection()
+
+        company = Company(name='Company')
+        company.save()
+
+        author = User(name='Author', company=company)
+        author.save()
+
+        commenter = User(name='Commenter')
+        commenter.save()
+
+        tag = Tag(name='Tag')
+        tag.save()
+
+        BlogPost(author=author, comments=[Comment(by=commenter)], tags=[tag]).save()
+        BlogPost(author=commenter, tags=[tag, tag]).save()
+
+        posts = BlogPost.objects.eagerload('author.company', 'comments.by', BlogPost.tags, only=[User.name]).all()
+
+        self.assertEqual(type(posts[0]._data['author']), User)
+        self.assertEqual(type(posts[0]._data['author']._data['company']), Company)
+        self.assertEqual(posts[0]._data['author']._data['company'].name, 'Company')
+        self.assertEqual(type(posts[0].comments[0]._data['by']), User)
+        self.assertEqual([type(t) for t in posts[1]._data['tags']], [Tag, Tag])
+        self.assertEqual(posts[1]._data['tags'][0].name, 'Tag')
+
+        self.assertRaises(EagerloadException, BlogPost.objects.eagerload, 'author.name')
+        self.assertRaises(EagerloadException, BlogPost.objects.eagerload, 'writer')
+
+        Company.drop_collection()
+        User.drop_collection()
+        Tag.drop_collection()
+        BlogPost.drop_collection()
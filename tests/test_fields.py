@@ -297,6 +297,36 @@ class FieldTest(unittest.TestCase):
         User.drop_collection()
         Group.drop_collection()
 
+    def test_list_item_batch_dereference(self):
+        class User(documents.Document):
+            name = fields.StringField()
+
+        class Group(documents.Document):
+            members = fields.ListField(fields.ReferenceField(User))
+
+        User.drop_collection()
+        Group.drop_collection()
+
+        user1 = User(name='user1')
+        user1.save()
+        user2 = User(name='user2')
+        user2.save()
+        user3 = User(name='user3')
+        user3.save()
+
+        group = Group(members=[user2, user1, user3, user2])
+        group.save()
+
+        user3.delete()
+
+        group_obj = Group.objects.first()
+
+        self.assertEqual([member.name for member in group_obj.members], ['user2', 'user1', 'user2'])
+        self.assertTrue(group_obj.members[0] is group_obj.members[2])
+
+        User.drop_collection()
+        Group.drop_collection()
+
     def test_recursive_reference(self):
         class Employee(documents.Document):
             name = fields.StringField()
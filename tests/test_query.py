@@ -2,7 +2,10 @@ import unittest
 import pymongo
 from datetime import datetime
 from conjure import documents, fields, query, exceptions
+from conjure.identity_map import IdentityMap
+from conjure.futures import submit, gather
 import bson
+import threading
 
 class QueryTest(unittest.TestCase):
     def setUp(self):
@@ -431,6 +434,258 @@ class QueryTest(unittest.TestCase):
 
         BlogPost.drop_collection()
 
+    def test_values(self):
+        User = self.User
+
+        user1 = User(name='User A', age=20)
+        user1.save()
+        User(name='User B').save()
+
+        self.assertEqual(list(User.objects.values('name', 'age')), [
+            {'name': 'User A', 'age': 20},
+            {'name': 'User B', 'age': None},
+        ])
+
+        self.assertEqual(User.objects.filter_by(name='User A').values_list('id', User.age).one(), (user1.id, 20))
+        self.assertEqual(User.objects.sort('name').values_list('name', flat=True).all(), ['User A', 'User B'])
+        self.assertEqual(User.objects.sort('-name').values_list('age', flat=True)[0], None)
+
+        self.assertRaises(exceptions.InvalidQueryError, User.objects.values_list, 'name', 'age', flat=True)
+        self.assertRaises(exceptions.InvalidQueryError, User.objects.values, 'nationality')
+
+    def test_insert_many(self):
+        class Account(documents.Document):
+            name = fields.StringField(required=True)
+            age = fields.IntegerField()
+
+        accounts = [Account(name='User %d' % i, age=i) for i in xrange(5)]
+
+        self.assertEqual(Account.objects.insert_many(accounts, batch_size=2), accounts)
+        self.assertTrue(all(isinstance(account.id, bson.ObjectId) for account in accounts))
+        self.assertEqual(Account.objects.count(), 5)
+        self.assertEqual(Account.objects.with_id(accounts[3].id).age, 3)
+
+        accounts[0].age = 50
+        accounts[0].save()
+        self.assertEqual(Account.objects.count(), 5)
+
+        batch = [Account(name='A'), Account(age=1), Account(name='B'), Account(age=2), Account(name='C')]
+
+        try:
+            Account.objects.insert_many(batch, batch_size=2)
+        except exceptions.OperationError, err:
+            self.assertEqual([error['index'] for error in err.errors], [1, 3])
+            self.assertTrue(err.errors[0]['document'] is batch[1])
+        else:
+            self.fail()
+
+        self.assertEqual(Account.objects.count(), 8)
+        self.assertEqual(batch[1].id, None)
+
+        batch = [Account(name='D'), Account(age=1), Account(name='E')]
+        self.assertRaises(exceptions.OperationError, Account.objects.insert_many, batch, ordered=True)
+        self.assertEqual(Account.objects.count(), 9)
+        self.assertEqual(batch[2].id, None)
+
+    def test_read_preference(self):
+        User = self.User
+
+        class Report(documents.Document):
+            name = fields.StringField()
+
+            class Meta:
+                read_preference = 'secondary_preferred'
+
+        User(name='User A', age=20).save()
+
+        q = User.objects.secondary_ok()
+        self.assertEqual(q._read_options(), {'read_preference': pymongo.ReadPreference.SECONDARY_PREFERRED})
+        self.assertEqual([user.name for user in q], ['User A'])
+        self.assertEqual(q.count(), 1)
+        self.assertRaises(exceptions.InvalidQueryError, q.read_preference, pymongo.ReadPreference.PRIMARY)
+
+        q = User.objects.read_preference(pymongo.ReadPreference.NEAREST, [{'dc': 'east'}])
+        self.assertEqual(q._read_options(), {'read_preference': pymongo.ReadPreference.NEAREST, 'tag_sets': [{'dc': 'east'}]})
+        self.assertEqual(q.clone().filter_by(name='User A').one().age, 20)
+
+        self.assertEqual(User.objects._read_options(), {})
+        self.assertEqual(Report.objects._read_options(), {'read_preference': pymongo.ReadPreference.SECONDARY_PREFERRED})
+        self.assertEqual(Report.objects.read_preference('primary')._read_options(), {'read_preference': pymongo.ReadPreference.PRIMARY})
+
+    def test_clone(self):
+        User = self.User
+
+        User(name='User A', age=20).save()
+        User(name='User B', age=30).save()
+
+        q = User.objects.filter(User.age > 10).only('name').sort('age')
+        clone = q.clone().filter(User.age > 25).only('age').sort('-name')
+
+        self.assertEqual(q._fields, {'_cls': 1, 'name': 1})
+        self.assertEqual(len(q._deferred_sort), 1)
+        self.assertEqual([user.name for user in q], ['User A', 'User B'])
+        self.assertEqual([user.age for user in clone], [30])
+
+        first = q.clone()
+        self.assertEqual(first.first().name, 'User A')
+        self.assertEqual([user.name for user in q.clone()], ['User A', 'User B'])
+
+    def test_background(self):
+        User = self.User
+
+        user1 = User(name='User A', age=20)
+        user2 = User(name='User B', age=30)
+
+        gather(submit(user1.save), submit(user2.save))
+
+        q = User.objects.sort('age')
+        users, count, user = gather(q.background().all(), q.background().count(), q.clone().filter(User.age > 25).background().one())
+
+        self.assertEqual([u.name for u in users], ['User A', 'User B'])
+        self.assertEqual(count, 2)
+        self.assertEqual(user.name, 'User B')
+        self.assertEqual(len(q.all()), 2)
+
+        self.assertRaises(exceptions.DoesNotExist, q.background().first(User.age > 50).result)
+
+        with IdentityMap() as identity_map:
+            submit(User.objects.with_id, user1.id).result()
+            self.assertEqual(len(identity_map), 1)
+
+        users = [User(name='User #%d' % i, age=i) for i in xrange(20)]
+
+        for u in users:
+            u.save()
+
+        with IdentityMap(max_size=5) as identity_map:
+            futures = [submit(User.objects.in_bulk, [u.id for u in users]) for _ in xrange(20)]
+
+            for u in users:
+                self.assertEqual(User.objects.with_id(u.id).name, u.name)
+
+            for loaded in gather(*futures):
+                self.assertEqual(sorted(loaded), sorted(u.id for u in users))
+
+            self.assertEqual(len(identity_map), 5)
+
+    def test_prepare(self):
+        User = self.User
+
+        class Post(documents.Document):
+            author = fields.ReferenceField(User)
+            title = fields.StringField()
+
+        user1 = User(name='User A', age=20)
+        user1.save()
+        user2 = User(name='User B', age=30)
+        user2.save()
+
+        Post(author=user1, title='First').save()
+        Post(author=user2, title='Second').save()
+        Post(author=user2, title='Third').save()
+
+        prepared = Post.objects.sort('-title').prepare(lambda p: (Post.author == p.author) & Post.title.in_(p.titles))
+
+        self.assertEqual([post.title for post in prepared(author=user2, titles=['Second', 'Third'])], ['Third', 'Second'])
+        self.assertEqual([post.title for post in prepared(author=user1.id, titles=['Second'])], [])
+
+        prepared = User.objects.prepare(lambda p: (User.age >= p.age) & User.name.nin([p.name, 'User C']))
+
+        self.assertEqual(prepared.bind(age=20, name='User A')._compile_spec(), {'age': {'$gte': 20}, 'name': {'$nin': ['User A', 'User C']}})
+        self.assertEqual(prepared.bind(age=25, name='User C').one().name, 'User B')
+
+        self.assertRaises(exceptions.InvalidQueryError, prepared.bind, age=20)
+        self.assertRaises(exceptions.InvalidQueryError, prepared.bind(age=20, name='').filter(User.age == 5).one)
+
+        for builder in (lambda p: User.name.startswith(p.name), lambda p: User.name.icontains(p.name),
+                        lambda p: User.name.re(p.pattern), lambda p: User.age.set(p.age)):
+            self.assertRaises(exceptions.InvalidQueryError, User.objects.prepare, builder)
+
+        self.assertRaises(exceptions.InvalidQueryError, lambda: User.age + query.Params().age)
+
+    def test_cursor_options(self):
+        User = self.User
+
+        User(name='User A', age=20).save()
+        User(name='User B', age=30).save()
+
+        q = User.objects.batch_size(1).max_time_ms(1000).no_cursor_timeout()
+        self.assertEqual([user.name for user in q.clone().sort('age')], ['User A', 'User B'])
+        self.assertEqual(q.clone().filter(User.age > 25).one().name, 'User B')
+
+        q = q.limit(1).batch_size(50)
+        self.assertEqual(q._batch_size, 50)
+        self.assertEqual(len(list(q)), 1)
+
+    def test_identity_map(self):
+        User = self.User
+
+        class BlogPost(documents.Document):
+            title = fields.StringField()
+            author = fields.ReferenceField(User)
+
+        BlogPost.drop_collection()
+
+        author = User(name='Author')
+        author.save()
+
+        BlogPost(title='Post #1', author=author).save()
+        BlogPost(title='Post #2', author=author).save()
+
+        posts = list(BlogPost.objects)
+        self.assertFalse(posts[0].author is posts[1].author)
+
+        with IdentityMap(max_size=2) as identity_map:
+            posts = list(BlogPost.objects)
+            self.assertTrue(posts[0].author is posts[1].author)
+            self.assertTrue(User.objects.with_id(author.id) is posts[0].author)
+            self.assertEqual(len(identity_map), 2)
+
+            self.assertEqual(User.objects.only('name').with_id(author.id).name, 'Author')
+            self.assertFalse(User.objects.filter_by(name='Nobody').with_id(author.id))
+
+            User.objects.filter_by(id=author.id).update(User.name.set('Changed'))
+            self.assertEqual(User.objects.with_id(author.id).name, 'Changed')
+
+            identity_map.invalidate(User)
+            self.assertFalse(User.objects.with_id(author.id) is posts[0].author)
+
+            User.objects.with_id(author.id)
+            self.assertEqual(User.objects.values_list('name', flat=True).with_id(author.id), 'Changed')
+
+        BlogPost.drop_collection()
+
+    def test_identity_map_threads(self):
+        User = self.User
+
+        users = [User(id=bson.ObjectId(), name='User #%d' % i) for i in xrange(200)]
+        identity_map = IdentityMap(max_size=50)
+        errors = []
+
+        def work(offset):
+            try:
+                for i in xrange(2000):
+                    user = users[(offset + i) % len(users)]
+                    identity_map.add(user)
+                    identity_map.get(User, user.id)
+
+                    if i % 100 == 0:
+                        identity_map.invalidate(User)
+            except Exception, e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(i * 7,)) for i in xrange(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(len(identity_map) <= 50)
+        self.assertEqual(len(identity_map._documents), len(identity_map))
+
     def test_chain_regex(self):
         class TextHolder(documents.Document):
             data = fields.StringField()
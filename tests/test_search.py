@@ -0,0 +1,330 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'stubs'))
+
+import base64
+import datetime
+import json
+import pyes
+import tempfile
+from bson.objectid import ObjectId
+from bson.timestamp import Timestamp
+from conjure import documents, fields, search
+
+HOST = 'localhost:9200'
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        pyes.ES.reset()
+        search._connections.clear()
+
+        class Article(documents.Document):
+            title = fields.StringField()
+            views = fields.IntegerField()
+
+        class ArticleIndex(search.Index):
+            title = search.Term()
+            views = search.Term()
+
+            class Meta:
+                host = HOST
+                model = Article
+
+        self.Article = Article
+        self.index = ArticleIndex.instance()
+        self.es = pyes.ES(HOST)
+
+        # mongomock can't filter on timestamps, so the oplog is kept in a list.
+        self.oplog = [{'ts': Timestamp(1000, 0), 'op': 'n', 'o': {}}]
+        self.patched = search._oplog_position, search._oplog_entries, search._swap
+
+        def position(index):
+            ts = self.oplog[-1]['ts']
+            return [ts.time, ts.inc]
+
+        def entries(index, position):
+            return [entry for entry in self.oplog if entry['ts'] > Timestamp(*position)]
+
+        search._oplog_position = position
+        search._oplog_entries = entries
+
+    def tearDown(self):
+        search._oplog_position, search._oplog_entries, search._swap = self.patched
+        self.Article.drop_collection()
+        del search._indexes[:]
+
+    def log(self, op, obj_id):
+        ts = self.oplog[-1]['ts']
+        self.oplog.append({'ts': Timestamp(ts.time, ts.inc + 1), 'op': op, 'o': {'_id': obj_id}})
+
+    def documents(self, name=None):
+        found = self.es.documents(name or self.index.namespace)
+        return dict((base64.b64decode(doc_id), doc) for doc_id, doc in found.iteritems())
+
+    def create(self, n):
+        Article = self.Article
+        start = datetime.datetime(2014, 1, 1)
+
+        for i in xrange(n):
+            Article(id=ObjectId.from_datetime(start + datetime.timedelta(days=i)), title='t%d' % i, views=i).save()
+
+    def test_split(self):
+        self.assertEqual(search._split(self.index, 4), [(None, None)])
+
+        self.create(8)
+
+        ranges = search._split(self.index, 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+
+        for (_, upper), (lower, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(upper, lower)
+
+        self.assertEqual(search._split(self.index, 1), [(None, None)])
+
+    def test_reindex_resume(self):
+        self.create(8)
+
+        path = os.path.join(tempfile.mkdtemp(), 'reindex.json')
+        reindex_range = search._reindex_range
+        ran = []
+
+        def failing(args):
+            if args[2] == 2:
+                raise RuntimeError('worker died')
+
+            ran.append(args[2])
+            return reindex_range(args)
+
+        search._reindex_range = failing
+
+        try:
+            self.assertRaises(RuntimeError, search.reindex, processes=1, bulk_size=3, resume=path)
+        finally:
+            search._reindex_range = reindex_range
+
+        with open(path) as f:
+            progress = json.load(f)[self.index.namespace]
+
+        self.assertEqual(sorted(progress['done']), [0, 1])
+        self.assertEqual(len(progress['ranges']), 4)
+        self.assertEqual(len(self.es.documents(progress['target'])), len(ran) * 2)
+
+        search.reindex(processes=1, bulk_size=3, resume=path)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual([call[1] for call in self.es.cluster.calls if call[0] == 'create_index'],
+                         [progress['target']])
+        self.assertEqual(len(self.documents()), 8)
+        self.assertEqual(self.documents()[str(ObjectId.from_datetime(datetime.datetime(2014, 1, 1)))],
+                         {'title': 't0', 'views': 0})
+
+    def test_reindex_defaults(self):
+        class Task(documents.Document):
+            name = fields.StringField()
+            status = fields.StringField(default='open')
+
+        class TaskIndex(search.Index):
+            name = search.Term()
+            status = search.Term()
+
+            class Meta:
+                host = HOST
+                model = Task
+
+        index = TaskIndex.instance()
+
+        try:
+            task = Task(name='live')
+            task.save()
+            Task.objects._collection.insert({'name': 'raw'})
+
+            search.reindex(only=[index.namespace], processes=1)
+
+            indexed = self.es.documents(index.namespace).values()
+            self.assertEqual(sorted(doc['name'] for doc in indexed), ['live', 'raw'])
+            self.assertEqual([doc['status'] for doc in indexed], ['open', 'open'])
+
+            index.indexer().index_document(Task.objects.filter_by(name='raw').one())
+            self.assertEqual(len(self.es.documents(index.namespace)), 2)
+            self.assertEqual(sorted(self.es.documents(index.namespace).values()), sorted(indexed))
+        finally:
+            Task.drop_collection()
+
+    def test_swap(self):
+        self.create(2)
+
+        self.es.create_index(self.index.namespace)
+        self.es.index({'title': 'stale'}, self.index.namespace, 'Article', id='stale')
+
+        search.reindex(processes=1)
+
+        target, = self.es.get_alias(self.index.namespace)
+        self.assertNotEqual(target, self.index.namespace)
+        self.assertFalse(self.index.namespace in self.es.cluster.indices)
+        self.assertEqual(sorted(doc['title'] for doc in self.documents().values()), ['t0', 't1'])
+        self.assertEqual(self.es.cluster.settings[target]['index'], {'number_of_replicas': 1, 'refresh_interval': '1s'})
+
+        # Swapping again, as a resumed run does, must not delete the index through the alias.
+        search._swap(self.index, target)
+
+        self.assertEqual(self.es.get_alias(self.index.namespace), [target])
+        self.assertEqual(len(self.documents()), 2)
+
+        self.es.create_index('old')
+        self.es.change_aliases([('remove', target, self.index.namespace), ('add', 'old', self.index.namespace)])
+
+        search._swap(self.index, target)
+
+        self.assertEqual(self.es.get_alias(self.index.namespace), [target])
+        self.assertFalse('old' in self.es.cluster.indices)
+
+    def test_replay(self):
+        Article = self.Article
+
+        self.create(3)
+        first, second, third = Article.objects.sort('id')
+
+        reindex_range = search._reindex_range
+        swap = search._swap
+
+        def loading(args):
+            result = reindex_range(args)
+
+            if args[2] == 0:
+                Article.objects.filter_by(id=first.id).update(Article.title.set('changed'))
+                self.log('u', first.id)
+                second.delete()
+                self.log('d', second.id)
+
+            return result
+
+        def swapping(index, target):
+            late = Article(title='late', views=9)
+            late.save()
+            self.log('i', late.id)
+            swap(index, target)
+
+        search._reindex_range = loading
+        search._swap = swapping
+
+        try:
+            search.reindex(processes=1)
+        finally:
+            search._reindex_range = reindex_range
+
+        self.assertEqual(sorted(doc['title'] for doc in self.documents().values()), ['changed', 'late', 't2'])
+
+    def test_search(self):
+        Article = self.Article
+
+        a = Article(title='a', views=1)
+        a.save()
+        b = Article(title='b', views=2)
+        b.save()
+        c = Article(title='c', views=3)
+        c.save()
+
+        indexer = self.index.indexer()
+
+        for obj in (c, b, a):
+            indexer.index_document(obj)
+
+        b.delete()
+
+        results = search.search(Article, 'query', limit=10)
+
+        self.assertEqual(results.total, 3)
+        self.assertEqual([obj.id for obj, _ in results], [c.id, a.id])
+        self.assertEqual([meta['rank'] for _, meta in results], [1, 3])
+
+        results = self.index.search('query', limit=10, only=['title'])
+
+        self.assertEqual([obj.title for obj, _ in results], ['c', 'a'])
+        self.assertEqual([obj.views for obj, _ in results], [None, None])
+
+    def test_source(self):
+        class Event(documents.Document):
+            name = fields.StringField()
+            at = fields.DateTimeField()
+            attendees = fields.IntegerField()
+            code = fields.StringField()
+
+        class EventIndex(search.Index):
+            name = search.Term()
+            at = search.Term()
+            attendees = search.Term(coerce=str)
+            code = search.Term(coerce=lambda value: value.upper(), parse=lambda value: value.lower())
+            day = search.Term(coerce=lambda value: value.date())
+
+            class Meta:
+                host = HOST
+                model = Event
+
+        index = EventIndex.instance()
+
+        try:
+            at = datetime.datetime(2014, 3, 1, 12, 30, 15, 250)
+            event = Event(name='launch', at=at, attendees=12, code='abc')
+            event.save()
+            event.day = at
+
+            index.indexer().index_document(event)
+
+            result, = [obj for obj, _ in index.search_source('launch')]
+
+            self.assertEqual(result.id, event.id)
+            self.assertEqual(result.name, 'launch')
+            self.assertEqual(result.at, at)
+            self.assertEqual(result['attendees'], 12)
+            self.assertEqual(result.code, 'abc')
+            self.assertEqual(result.day, '2014-03-01')
+            self.assertEqual(result.load().name, 'launch')
+            self.assertRaises(AttributeError, getattr, result, 'missing')
+
+            self.assertEqual(index.parse_source({'at': '2014-03-01T12:30:15'})['at'], at.replace(microsecond=0))
+        finally:
+            Event.drop_collection()
+
+    def test_buffered_indexer(self):
+        Article = self.Article
+
+        a = Article(title='a', views=1)
+        a.save()
+        b = Article(title='b', views=2)
+        b.save()
+
+        self.index.indexer().index_document(b)
+
+        indexer = search.BufferedIndexer(self.index, interval=60)
+
+        indexer.insert(Article.objects._collection.find_one({'_id': a.id}))
+        indexer.delete(a.id)
+        self.assertEqual(len(indexer), 0)
+
+        indexer.delete(b.id)
+        indexer.insert(Article.objects._collection.find_one({'_id': b.id}))
+        indexer.delete(b.id)
+        self.assertEqual(len(indexer), 1)
+
+        c = Article(title='c', views=3)
+        c.save()
+
+        indexer.insert(Article.objects._collection.find_one({'_id': c.id}))
+        Article.objects.filter_by(id=c.id).update(Article.title.set('d'))
+        indexer.update(c.id, {'o': {'$set': {'title': 'd'}}})
+        indexer.update(c.id, {'o': {'$set': {'unrelated': 1}}})
+        self.assertEqual(len(indexer), 2)
+
+        indexer.flush()
+
+        self.assertEqual(len(indexer), 0)
+        self.assertEqual(self.documents(), {str(c.id): {'title': 'd', 'views': 3}})
+
+
+if __name__ == '__main__':
+    unittest.main()
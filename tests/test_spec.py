@@ -1,6 +1,7 @@
 from conjure import fields, documents
 import unittest
 import datetime
+import re
 from conjure.documents import EmbeddedDocument
 from conjure.fields import StringField, EmbeddedDocumentField, ListField
 import conjure
@@ -174,6 +175,62 @@ class SpecTest(unittest.TestCase):
         self.assertEqual(Note.text.set('test'), {'$set': {'notes.$.text': 'test'}})
         self.assertEqual(Settings.text.set('test'), {'$set': {'settings.text': 'test'}})
 
+    def test_immutable(self):
+        following = [1, 2]
+        spec = User.following.in_(following)
+        following.append(3)
+
+        self.assertEqual(spec, {'following': {'$in': [1, 2]}})
+
+        combined = spec & (User.age > 18)
+        combined &= User.username == 'stanislav'
+
+        self.assertEqual(spec, {'following': {'$in': [1, 2]}})
+        self.assertEqual(combined, {'following': {'$in': [1, 2]}, 'age': {'$gt': 18}, 'username': 'stanislav'})
+
+        either = (User.age < 5) | (User.age > 80)
+        compiled = either.compile()
+        both = either & (User.username == 'a')
+
+        self.assertTrue(both._tree[0] is either._tree)
+        self.assertTrue(either.clone()._tree is either._tree)
+        self.assertEqual(both.compile()['username'], 'a')
+
+        changed = both.clone()
+        changed['username'] = 'b'
+        changed |= User.age == 50
+
+        self.assertEqual(both.compile()['username'], 'a')
+        self.assertEqual(len(both.compile()['$or']), 2)
+        self.assertEqual(either, compiled)
+        self.assertFalse('username' in either.compile())
+
+    def test_string_keys(self):
+        spec = User.age > 5
+        spec['age:lt'] = 10
+
+        self.assertEqual(spec['age:lt'], 10)
+        self.assertEqual(spec['age:gt'], 5)
+        self.assertTrue('age:lt' in spec)
+        self.assertTrue(('age', ('lt',)) in spec)
+        self.assertFalse('age:lte' in spec)
+
+        del spec['age:gt']
+        self.assertEqual(spec, {'age': {'$lt': 10}})
+
+    def test_regex_values(self):
+        pattern = re.compile('^a')
+
+        spec = User.username.icontains('a') | (User.age > 5)
+        self.assertTrue(spec.compile()['$or'][0]['username'].flags & re.IGNORECASE)
+
+        spec = User.username.in_([pattern, 'b'])
+        self.assertTrue(spec.compile()['username']['$in'][0] is pattern)
+        self.assertEqual((spec & (User.age > 5)).compile()['age'], {'$gt': 5})
+
+        spec = User.widgets.match(Widget.index.in_([pattern, 1]))
+        self.assertTrue(spec | (User.age > 5))
+
     def test_replace_with(self):
         class Note(EmbeddedDocument):
             text = StringField()